@@ -6,9 +6,7 @@ import time
 import webapp2
 from google.appengine.ext.webapp import template
 
-from quant.black_scholes import BlackScholes
-from quant.binomial_trees import BinomialTree
-from quant.monte_carlo import MonteCarlo
+from quant.engines import Model, get_price
 from quant.option import OptionType
 
 
@@ -37,17 +35,14 @@ class Pricing(webapp2.RequestHandler):
         
     def get_price(self, otype, method, spot, strike, rate, expiry, vol, coc):
         t0 = time.time()
-        if method == 'formula':
-            bs = BlackScholes('', spot, strike, rate, expiry, vol, cost_of_carry=coc)
-            price = bs.get_option_price(otype)
-        elif method == 'bitree':
-            num = int(self.request.get('bt_step_num'))
-            bt = BinomialTree(spot, strike, rate, expiry, vol, steps=num)
-            price = bt.get_option_price(otype)
-        else: # simulation
-            num = int(self.request.get('mc_simu_num'))
-            mc = MonteCarlo(spot, strike, rate, expiry, vol, coc)
-            price = mc.run(otype, num, 0) # 0 for single process at GAE doesn't support multiprocess
+        if method == Model.LATTICE:
+            params = {'steps': int(self.request.get('bt_step_num'))}
+        elif method == Model.SIMULATION:
+            params = {'simu_num': int(self.request.get('mc_simu_num'))}
+        else:
+            params = {}
+        # The fastest backend available on this host, e.g. numpy or the native extensions
+        price = get_price(method, spot, strike, rate, expiry, vol, coc, otype, **params)
 
         t = time.time() - t0
 
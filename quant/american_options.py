@@ -0,0 +1,241 @@
+'''
+American options - analytic approximations
+
+An American option is worth the European one plus an early exercise premium. A call on an asset with cost of
+carry b >= r is never exercised early, so it is worth the European call.
+
+1. Barone-Adesi and Whaley (quadratic approximation)
+    call:
+        C = c(S) + A2 * (S / S*)**q2    if S < S*
+            S - X                       if S >= S*
+
+        A2 = S* / q2 * (1 - exp((b - r) * T) * N(d1(S*)))
+        q2 = (-(N - 1) + sqrt((N - 1)**2 + 4 * M / K)) / 2
+
+    put:
+        P = p(S) + A1 * (S / S**)**q1   if S > S**
+            X - S                       if S <= S**
+
+        A1 = - S** / q1 * (1 - exp((b - r) * T) * N(-d1(S**)))
+        q1 = (-(N - 1) - sqrt((N - 1)**2 + 4 * M / K)) / 2
+
+    where
+        N = 2 * b / vol**2,  M = 2 * r / vol**2,  K = 1 - exp(-r * T)
+        c, p: the generalized Black-Scholes prices
+        S*, S**: the critical prices above/below which the option is exercised, solving
+
+            S* - X  = c(S*) + (1 - exp((b - r) * T) * N(d1(S*))) * S* / q2
+            X - S** = p(S**) - (1 - exp((b - r) * T) * N(-d1(S**))) * S** / q1
+
+        by Newton's method, from the seed values of Barone-Adesi and Whaley.
+
+    With z = 1 for a call and z = -1 for a put, both are
+        z * (S - X) = euro(S) + z * (1 - exp((b - r) * T) * N(z * d1)) * S / q
+
+2. Bjerksund and Stensland (1993, flat exercise boundary)
+    C = alpha * S**beta - alpha * phi(S, T, beta, I, I) + phi(S, T, 1, I, I) - phi(S, T, 1, X, I)
+        - X * phi(S, T, 0, I, I) + X * phi(S, T, 0, X, I)       if S < I
+        S - X                                                   if S >= I
+    and not below S - X, the value of exercising at once.
+
+    where
+        alpha = (I - X) * I**(-beta)
+        beta  = (1/2 - b / vol**2) + sqrt((b / vol**2 - 1/2)**2 + 2 * r / vol**2)
+        phi(S, T, gamma, H, I) = exp(lambda) * S**gamma * (N(d) - (I / S)**kappa * N(d - 2 * log(I / S) / (vol * sqrt(T))))
+        lambda = (-r + gamma * b + gamma * (gamma - 1) * vol**2 / 2) * T
+        d      = -(log(S / H) + (b + (gamma - 1/2) * vol**2) * T) / (vol * sqrt(T))
+        kappa  = 2 * b / vol**2 + 2 * gamma - 1
+
+        I = B0 + (Binf - B0) * (1 - exp(h)),  the exercise boundary
+        h = -(b * T + 2 * vol * sqrt(T)) * B0 / (Binf - B0)
+        Binf = beta / (beta - 1) * X,  B0 = max(X, r / (r - b) * X)
+
+    The put comes from the call by the put-call transformation:
+        P(S, X, T, r, b, vol) = C(X, S, T, r - b, -b, vol)
+
+    The 2002 version with two boundaries needs the bivariate normal distribution, which is not available here.
+
+A put with r <= 0 is never exercised early either (by the put-call transformation of 2., it is a call with
+b' = -b >= r' = r - b), so it is worth the European put. As r -> 0, M / K -> 2 / (vol**2 * T).
+
+Both price a whole book of arrays in a few numpy operations, thousands of times faster than a binomial tree
+of the same accuracy for short maturities: within about 0.1 of a tree with 2001 steps for a strike of 100 
+up to 1 year. Barone-Adesi and Whaley overprices long dated options, and Bjerksund and Stensland, whose 
+boundary is flat, underprices them slightly (it is a lower bound). compare_with_lattice measures their errors 
+against a binomial tree with many steps; run this module to see them on a grid of contracts.
+'''
+
+import numpy as np
+
+from binomial_trees import get_lattice_prices
+from black_scholes import get_option_prices
+from option import OptionType, OptionTypeError, cdf_array
+
+
+class Approximation(object):
+    BAW = 0                 # Barone-Adesi and Whaley
+    BJERKSUND_STENSLAND = 1 # Bjerksund and Stensland 1993
+
+
+def _get_args(spot, strike, rate, expiry, vol, cost_of_carry, otype):
+    '''Broadcast and flatten the contract arguments, and turn otype into z: 1 for a call and -1 for a put'''
+    otype = np.asarray(otype)
+    is_put = otype == OptionType.PUT
+    if not (is_put | (otype == OptionType.CALL)).all():
+        raise OptionTypeError
+    z = np.where(is_put, -1.0, 1.0)
+
+    args = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in
+                                 (spot, strike, rate, expiry, vol, cost_of_carry, z)])
+    return args[0].shape, [v.ravel() for v in args]
+
+
+def _get_otype(z):
+    return np.where(z < 0, OptionType.PUT, OptionType.CALL)
+
+
+def get_baw_prices(spot, strike, rate, expiry, vol, cost_of_carry, otype, tol=1e-10, max_iter=100):
+    '''Price a batch of American options by the approximation of Barone-Adesi and Whaley.
+
+    Every argument can be a scalar or an array, they are broadcast against each other as in
+    black_scholes.get_option_prices. Return an array of prices.
+    tol: the relative error of the critical price at which Newton's method stops
+    '''
+    shape, (spot, strike, rate, expiry, vol, cost_of_carry, z) = _get_args(spot, strike, rate, expiry, vol,
+                                                                             cost_of_carry, otype)
+    price = get_option_prices(spot, strike, rate, expiry, vol, cost_of_carry, _get_otype(z))
+
+    # Only the puts with r > 0 and the calls with b < r have an early exercise premium
+    idx = np.flatnonzero(np.where(z < 0, rate > 0, cost_of_carry < rate))
+    if len(idx):
+        s, x, r, t, v, b, zz = [a[idx] for a in (spot, strike, rate, expiry, vol, cost_of_carry, z)]
+        vol_sqrt_t = v * np.sqrt(t)
+        carry_df = np.exp((b - r) * t)
+        n = 2 * b / v ** 2
+        m = 2 * r / v ** 2
+        k = -np.expm1(- r * t)
+        m_k = np.where(r == 0, 2 / (v ** 2 * t), m / np.where(r == 0, 1, k)) # M / K, 2 / (vol**2 * T) as r -> 0
+        q = (-(n - 1) + zz * np.sqrt((n - 1) ** 2 + 4 * m_k)) / 2
+
+        # Seed value
+        q_inf = (-(n - 1) + zz * np.sqrt((n - 1) ** 2 + 4 * m)) / 2
+        s_inf = x / (1 - 1 / q_inf)
+        h = - (zz * b * t + 2 * vol_sqrt_t) * x / (zz * (s_inf - x))
+        critical = x + (s_inf - x) * -np.expm1(h)
+
+        # Newton's method on f(S) = z * (S - X) - euro(S) - z * (1 - exp((b - r) * T) * N(z * d1)) * S / q
+        # for the contracts which haven't converged yet
+        active = np.arange(len(idx))
+        for i in xrange(max_iter):
+            if not len(active):
+                break
+            sc, xa, za, qa, vsa, cda = (critical[active], x[active], zz[active], q[active], vol_sqrt_t[active],
+                                        carry_df[active])
+            d1 = (np.log(sc / xa) + (b[active] + v[active] ** 2 / 2) * t[active]) / vsa
+            n_zd1 = cdf_array(za * d1)
+            euro = get_option_prices(sc, xa, r[active], t[active], v[active], b[active], _get_otype(za))
+            f = za * (sc - xa) - euro - za * (1 - cda * n_zd1) * sc / qa
+            df = za * (1 - cda * n_zd1 * (1 - 1 / qa) - 1 / qa + za * cda * np.exp(- d1 ** 2 / 2) /
+                       (np.sqrt(2 * np.pi) * vsa * qa))
+            critical[active] = sc - f / df
+            active = active[np.abs(f / df) > tol * xa]
+
+        d1 = (np.log(critical / x) + (b + v ** 2 / 2) * t) / vol_sqrt_t
+        a = zz * critical / q * (1 - carry_df * cdf_array(zz * d1))
+        exercised = zz * (s - critical) >= 0
+        price[idx] = np.where(exercised, zz * (s - x), price[idx] + a * (s / critical) ** q)
+
+    return price.reshape(shape)
+
+
+def _phi(s, t, gamma, h, i, r, b, v):
+    vol_sqrt_t = v * np.sqrt(t)
+    lambda_ = (- r + gamma * b + gamma * (gamma - 1) * v ** 2 / 2) * t
+    d = - (np.log(s / h) + (b + (gamma - 0.5) * v ** 2) * t) / vol_sqrt_t
+    kappa = 2 * b / v ** 2 + 2 * gamma - 1
+    return np.exp(lambda_) * s ** gamma * (cdf_array(d) - (i / s) ** kappa *
+                                           cdf_array(d - 2 * np.log(i / s) / vol_sqrt_t))
+
+
+def _get_bs_call_prices(s, x, r, t, v, b):
+    '''The Bjerksund-Stensland price of American calls with b < r'''
+    sigma_sq = v ** 2
+    beta = (0.5 - b / sigma_sq) + np.sqrt((b / sigma_sq - 0.5) ** 2 + 2 * r / sigma_sq)
+    b_inf = beta / (beta - 1) * x
+    b_0 = np.maximum(x, r / (r - b) * x)
+    h = - (b * t + 2 * v * np.sqrt(t)) * b_0 / (b_inf - b_0)
+    i = b_0 + (b_inf - b_0) * -np.expm1(h)
+    alpha = (i - x) * i ** (- beta)
+
+    price = alpha * s ** beta - alpha * _phi(s, t, beta, i, i, r, b, v) + _phi(s, t, 1, i, i, r, b, v) - \
+            _phi(s, t, 1, x, i, r, b, v) - x * _phi(s, t, 0, i, i, r, b, v) + x * _phi(s, t, 0, x, i, r, b, v)
+    # Deep in the money below I, waiting for the flat boundary can be worth less than exercising now
+    return np.where(s >= i, s - x, np.maximum(price, s - x))
+
+
+def get_bjerksund_stensland_prices(spot, strike, rate, expiry, vol, cost_of_carry, otype):
+    '''Price a batch of American options by the approximation of Bjerksund and Stensland (1993).
+
+    Every argument can be a scalar or an array, they are broadcast against each other as in
+    black_scholes.get_option_prices. Return an array of prices.
+    '''
+    shape, (spot, strike, rate, expiry, vol, cost_of_carry, z) = _get_args(spot, strike, rate, expiry, vol,
+                                                                             cost_of_carry, otype)
+    # Puts as calls by the put-call transformation
+    is_put = z < 0
+    s = np.where(is_put, strike, spot)
+    x = np.where(is_put, spot, strike)
+    r = np.where(is_put, rate - cost_of_carry, rate)
+    b = np.where(is_put, - cost_of_carry, cost_of_carry)
+
+    price = get_option_prices(s, x, r, expiry, vol, b, OptionType.CALL)
+    idx = np.flatnonzero(b < r)
+    if len(idx):
+        price[idx] = _get_bs_call_prices(s[idx], x[idx], r[idx], expiry[idx], vol[idx], b[idx])
+
+    return price.reshape(shape)
+
+
+def get_american_prices(spot, strike, rate, expiry, vol, cost_of_carry, otype, method=Approximation.BAW):
+    '''Price a batch of American options by the approximation method'''
+    if method == Approximation.BAW:
+        return get_baw_prices(spot, strike, rate, expiry, vol, cost_of_carry, otype)
+    elif method == Approximation.BJERKSUND_STENSLAND:
+        return get_bjerksund_stensland_prices(spot, strike, rate, expiry, vol, cost_of_carry, otype)
+    else:
+        raise ValueError('Unknown approximation: {}'.format(method))
+
+
+def compare_with_lattice(spot, strike, rate, expiry, vol, cost_of_carry, otype, steps=2001):
+    '''Price a batch of American options by both approximations and by binomial trees with steps steps.
+    Return a dict of arrays of prices keyed by 'lattice', Approximation.BAW and Approximation.BJERKSUND_STENSLAND.
+    '''
+    prices = {'lattice': get_lattice_prices(spot, strike, rate, expiry, vol, cost_of_carry, otype, steps, True)}
+    for method in (Approximation.BAW, Approximation.BJERKSUND_STENSLAND):
+        prices[method] = get_american_prices(spot, strike, rate, expiry, vol, cost_of_carry, otype, method)
+
+    return prices
+
+
+if __name__ == '__main__':
+    import time
+
+    # A grid of calls and puts on futures (b = 0) and on stocks with a dividend yield
+    spots = np.array([80, 90, 100, 110, 120], dtype=float)[:, np.newaxis, np.newaxis, np.newaxis, np.newaxis]
+    expiries = np.array([0.1, 0.5, 1, 3])[:, np.newaxis, np.newaxis, np.newaxis]
+    vols = np.array([0.15, 0.25, 0.35])[:, np.newaxis, np.newaxis]
+    cocs = np.array([0, 0.04, 0.1])[:, np.newaxis]
+    otypes = np.array([OptionType.CALL, OptionType.PUT])
+    args = (spots, 100, 0.1, expiries, vols, cocs, otypes)
+
+    t0 = time.time()
+    prices = compare_with_lattice(*args)
+    print 'Lattice: {} seconds'.format(time.time() - t0)
+    for method, name in ((Approximation.BAW, 'Barone-Adesi and Whaley'),
+                         (Approximation.BJERKSUND_STENSLAND, 'Bjerksund and Stensland')):
+        t0 = time.time()
+        get_american_prices(*args, method=method)
+        t = time.time() - t0
+        errors = np.abs(prices[method] - prices['lattice'])
+        print '{}: {} contracts in {} seconds, max error {}, mean error {}'.format(
+              name, errors.size, t, errors.max(), errors.mean())
@@ -0,0 +1,73 @@
+from unittest import TestCase, main
+
+import numpy as np
+
+from american_options import (Approximation, get_baw_prices, get_bjerksund_stensland_prices, get_american_prices,
+                              compare_with_lattice)
+from black_scholes import get_option_prices
+from option import OptionType, OptionTypeError
+
+
+class AmericanOptionsTestCase(TestCase):
+
+    def test_baw(self):
+        '''Q: the table of Barone-Adesi and Whaley, strike price 100, risk free interest rate 8%, 
+        cost of carry -4%, volatility 20%, expiry 3 months, spot prices 80, 90, 100, 110, 120
+        A: calls 0.03, 0.59, 3.52, 10.31, 20.00 and puts 20.42, 11.25, 4.40, 1.12, 0.18'''
+        spots = [80, 90, 100, 110, 120]
+        self.assertEqual([0.03, 0.59, 3.52, 10.31, 20.0], 
+                         list(np.round(get_baw_prices(spots, 100, 0.08, 0.25, 0.2, -0.04, OptionType.CALL), 2)))
+        self.assertEqual([20.42, 11.25, 4.4, 1.12, 0.18], 
+                         list(np.round(get_baw_prices(spots, 100, 0.08, 0.25, 0.2, -0.04, OptionType.PUT), 2)))
+
+    def test_bjerksund_stensland(self):
+        '''Q: calls on futures, strike price 100, risk free interest rate 10%, cost of carry 0, volatility 15%,
+        expiry 0.1 year, spot prices 90, 100, 110
+        A: 0.02, 1.88, 10.00'''
+        self.assertEqual([0.02, 1.88, 10.0], 
+                         list(np.round(get_bjerksund_stensland_prices([90, 100, 110], 100, 0.1, 0.1, 0.15, 0, 
+                                                                      OptionType.CALL), 2)))
+
+    def test_bounds(self):
+        '''Not below the European price and the intrinsic value. A call with b >= r is European'''
+        spots = np.linspace(50, 150, 21)
+        for method in (Approximation.BAW, Approximation.BJERKSUND_STENSLAND):
+            for otype, z in ((OptionType.CALL, 1), (OptionType.PUT, -1)):
+                for coc in (-0.04, 0, 0.05):
+                    prices = get_american_prices(spots, 100, 0.05, 0.5, 0.3, coc, otype, method)
+                    european = get_option_prices(spots, 100, 0.05, 0.5, 0.3, coc, otype)
+                    self.assertTrue((prices >= european - 1e-10).all())
+                    self.assertTrue((prices >= z * (spots - 100) - 1e-10).all())
+                    if otype == OptionType.CALL and coc == 0.05:
+                        np.testing.assert_allclose(european, prices, rtol=1e-12)
+
+        self.assertRaises(OptionTypeError, get_baw_prices, 100, 100, 0.05, 0.5, 0.3, 0, 2)
+        self.assertRaises(ValueError, get_american_prices, 100, 100, 0.05, 0.5, 0.3, 0, OptionType.PUT, 2)
+
+    def test_compare_with_lattice(self):
+        '''Within 0.15 of a binomial tree with 2001 steps up to 1 year, calls and puts priced together'''
+        spots = np.array([80, 90, 100, 110, 120])[:, np.newaxis, np.newaxis]
+        expiries = np.array([0.1, 0.5, 1])[:, np.newaxis]
+        otypes = [OptionType.CALL, OptionType.PUT]
+        for coc in (0, 0.04):
+            prices = compare_with_lattice(spots, 100, 0.1, expiries, 0.25, coc, otypes)
+            self.assertEqual((5, 3, 2), prices['lattice'].shape)
+            for method in (Approximation.BAW, Approximation.BJERKSUND_STENSLAND):
+                self.assertTrue(np.abs(prices[method] - prices['lattice']).max() < 0.15)
+
+    def test_zero_rate(self):
+        '''With r <= 0 a put is worth the European put, and a call with b < r is still within 0.15 of the tree'''
+        spots = [80, 90, 100, 110, 120]
+        for rate in (0, -0.01):
+            for method in (Approximation.BAW, Approximation.BJERKSUND_STENSLAND):
+                prices = get_american_prices(spots, 100, rate, 0.5, 0.25, 0.02, OptionType.PUT, method)
+                self.assertTrue(np.allclose(get_option_prices(spots, 100, rate, 0.5, 0.25, 0.02, OptionType.PUT), 
+                                            prices))
+            prices = compare_with_lattice(spots, 100, rate, 0.5, 0.25, -0.04, OptionType.CALL)
+            for method in (Approximation.BAW, Approximation.BJERKSUND_STENSLAND):
+                self.assertFalse(np.isnan(prices[method]).any())
+                self.assertTrue(np.abs(prices[method] - prices['lattice']).max() < 0.15)
+
+
+if __name__ == '__main__':
+    main()
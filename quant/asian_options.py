@@ -0,0 +1,187 @@
+'''
+Exotic Options - Asian Options
+
+The payoff depends on the average of the prices at the fixings t1 < ... < tn <= T:
+
+    A = (S(t1) + ... + S(tn)) / n           arithmetic average
+    G = (S(t1) * ... * S(tn))**(1/n)        geometric average
+
+    fixed strike:    max(z * (A - X), 0)
+    floating strike: max(z * (S(T) - A), 0)
+    where z is 1 for a call and -1 for a put
+
+1. Geometric average - closed form
+    log(G) is normal, with
+
+        E(log(G))   = log(S) + (b - vol**2 / 2) * mean(t)
+        Var(log(G)) = vol**2 / n**2 * sum(min(ti, tj) for all i, j)
+        Cov(log(S(T)), log(G)) = vol**2 * mean(t)
+
+    and both payoffs are options to exchange one lognormal variable X2 for another X1, worth
+
+        exp(-r * T) * z * (E(X1) * N(z * d1) - E(X2) * N(z * d2))
+        d1 = (log(E(X1) / E(X2)) + v**2 / 2) / v,  d2 = d1 - v,  v**2 = Var(log(X1) - log(X2))
+
+    fixed strike:    X1 = G,    X2 = X,  v**2 = Var(log(G))
+    floating strike: X1 = S(T), X2 = G,  v**2 = vol**2 * T + Var(log(G)) - 2 * Cov(log(S(T)), log(G))
+
+    E(G) = exp(E(log(G)) + Var(log(G)) / 2) and E(S(T)) = S * exp(b * T).
+
+2. Arithmetic average - Monte Carlo simulation with a control variate
+    There is no closed form for the arithmetic average, so it is simulated on the fixings. A and G of a path
+    are nearly equal, so the payoff y of A moves with the payoff x of G of the same path, whose expectation is
+    known from 1. Each path is priced by
+
+        y - beta * (x - E(x))
+
+    which has the same expectation as y and the variance of the residual of y regressed on x, a small fraction
+    of the variance of y: for the fixed strike, the same standard error takes tens of times fewer paths.
+
+    beta = Cov(x, y) / Var(x) is estimated from a pilot batch of paths, which are not used in the price.
+    Estimated from the same paths as the price (like ControlVariateResult), beta would be correlated with
+    them and bias the price slightly; from the pilot batch it is a constant for the simulation, so the price
+    is unbiased and its standard error is that of a plain MonteCarloResult.
+'''
+
+from math import exp, log, sqrt
+
+import numpy as np
+
+from monte_carlo import MonteCarloResult, get_fixings, get_time_steps, iter_chunks
+from option import Option, OptionType, OptionTypeError, cdf, norminv_array
+from random_streams import RandomStreams, get_open_uniforms
+
+PILOT_CHUNK_ID = 2**32 - 1 # the chunk id of the stream of the pilot batch, beyond those of the simulation chunks
+
+
+class AsianStrike(object):
+    FIXED = 0
+    FLOATING = 1
+
+
+class AsianStrikeError(Exception):
+    def __str__(self):
+        return 'Unknown strike type. It must be AsianStrike.FIXED or AsianStrike.FLOATING'
+
+
+class AsianOption(Option):
+    '''An Asian option averaging the prices at fixings: the number of fixings evenly spaced until expiry,
+    or an increasing sequence of fixing times in (0, expiry]. The strike is not used by floating strike options.'''
+
+    def __init__(self, spot, strike, rate, expiry, vol, coc=None, fixings=12):
+        super(AsianOption, self).__init__(spot, strike, rate, expiry, vol)
+
+        self.coc = rate if coc is None else coc # b: cost of carry
+        self.times = get_fixings(fixings, expiry)
+
+    def _get_z(self, opt_type):
+        if opt_type == OptionType.CALL:
+            return 1
+        elif opt_type == OptionType.PUT:
+            return -1
+        else:
+            raise OptionTypeError
+
+    def _get_geometric_value(self, z, strike_type):
+        '''Return the expected payoff of the geometric average option, not discounted, see 1. above'''
+        n = len(self.times)
+        vol_sq = self.vol**2
+        mean_t = self.times.mean()
+        # Each ti is the smaller of 2 * (n - 1 - i) + 1 pairs (i, j)
+        var_log_g = vol_sq / n**2 * np.dot(self.times, 2 * np.arange(n - 1, -1, -1) + 1)
+        fwd_g = exp(log(self.spot) + (self.coc - vol_sq / 2) * mean_t + var_log_g / 2)
+
+        if strike_type == AsianStrike.FIXED:
+            fwd1, fwd2, var = fwd_g, self.strike, var_log_g
+        elif strike_type == AsianStrike.FLOATING:
+            fwd1, fwd2 = self.spot * exp(self.coc * self.expiry), fwd_g
+            var = vol_sq * self.expiry + var_log_g - 2 * vol_sq * mean_t
+        else:
+            raise AsianStrikeError
+
+        if var <= 1e-14: # e.g. a floating strike fixed at expiry only
+            return max(z * (fwd1 - fwd2), 0)
+        v = sqrt(var)
+        d1 = (log(fwd1 / fwd2) + var / 2) / v
+        return z * (fwd1 * cdf(z * d1) - fwd2 * cdf(z * (d1 - v)))
+
+    def get_geometric_price(self, opt_type, strike_type=AsianStrike.FIXED, round_digit=4):
+        '''Return the closed form price of the geometric average option'''
+        value = self._get_geometric_value(self._get_z(opt_type), strike_type)
+        return round(exp(- self.rate * self.expiry) * value, round_digit)
+
+    def simulate(self, opt_type, strike_type, simu_num, control_variate=True, pilot_num=10000, chunk_size=10000,
+                 seed=None, run_id=0, worker_id=0):
+        '''Price the arithmetic average option by Monte Carlo simulation and return a MonteCarloResult,
+        with the control variate coefficient in result.beta (0 without the control variate).
+
+        control_variate: use the geometric average option as a control variate, see 2. above, with beta
+                         estimated from pilot_num paths of the stream (seed, run_id, worker_id, PILOT_CHUNK_ID)
+        chunk_size, seed, run_id, worker_id: as MonteCarlo.simulate, see monte_carlo.iter_chunks
+        '''
+        z = self._get_z(opt_type)
+        if strike_type not in (AsianStrike.FIXED, AsianStrike.FLOATING):
+            raise AsianStrikeError
+
+        streams = RandomStreams(seed, run_id)
+        result = MonteCarloResult(exp(- self.rate * self.expiry))
+        beta = 0.0
+        if control_variate:
+            control_mean = self._get_geometric_value(z, strike_type)
+            payoffs, controls = self._simulate_chunk(z, strike_type, pilot_num,
+                                                     streams.get_random_state(worker_id, PILOT_CHUNK_ID))
+            var = controls.var()
+            beta = np.mean((controls - controls.mean()) * (payoffs - payoffs.mean())) / var if var > 0 else 0.0
+
+        for num, rs in iter_chunks(simu_num, chunk_size, streams, worker_id):
+            payoffs, controls = self._simulate_chunk(z, strike_type, num, rs)
+            if control_variate:
+                controls -= control_mean
+                controls *= beta
+                payoffs -= controls
+            result.add(payoffs)
+
+        result.seed = streams.seed
+        result.beta = beta
+        return result
+
+    def _simulate_chunk(self, z, strike_type, num, rs):
+        '''Simulate num paths on the fixings with the random numbers of rs and return the arrays of the payoffs
+        of the arithmetic and geometric averages, not discounted'''
+        dts, fixed = get_time_steps(self.times, self.expiry)[1:]
+        log_s = np.empty(num)
+        log_s.fill(log(self.spot))
+        sum_s = np.zeros(num)
+        sum_log_s = np.zeros(num)
+        for dt, fixing in zip(dts, fixed):
+            eps = norminv_array(get_open_uniforms(rs, num))
+            log_s += (self.coc - self.vol**2 / 2) * dt + self.vol * sqrt(dt) * eps
+            if fixing:
+                sum_s += np.exp(log_s)
+                sum_log_s += log_s
+
+        n = len(self.times)
+        arithmetic = sum_s / n
+        geometric = np.exp(sum_log_s / n)
+        if strike_type == AsianStrike.FIXED:
+            payoffs = z * (arithmetic - self.strike)
+            controls = z * (geometric - self.strike)
+        else:
+            s_t = np.exp(log_s)
+            payoffs = z * (s_t - arithmetic)
+            controls = z * (s_t - geometric)
+
+        return np.maximum(payoffs, 0, out=payoffs), np.maximum(controls, 0, out=controls)
+
+
+if __name__ == '__main__':
+    asian = AsianOption(100, 100, 0.08, 1, 0.3, 0.04, fixings=12)
+    for strike_type, name in ((AsianStrike.FIXED, 'Fixed'), (AsianStrike.FLOATING, 'Floating')):
+        for opt_type in (OptionType.CALL, OptionType.PUT):
+            plain = asian.simulate(opt_type, strike_type, 100000, control_variate=False, seed=1)
+            cv = asian.simulate(opt_type, strike_type, 100000, seed=1)
+            print '{} strike {}: geometric {}, arithmetic {:.4f} +/- {:.4f}, without control variate ' \
+                  '{:.4f} +/- {:.4f}, variance ratio {:.1f}'.format(
+                      name, 'call' if opt_type == OptionType.CALL else 'put',
+                      asian.get_geometric_price(opt_type, strike_type), cv.get_price(), cv.get_std_err(),
+                      plain.get_price(), plain.get_std_err(), (plain.get_std_err() / cv.get_std_err())**2)
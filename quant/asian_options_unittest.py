@@ -0,0 +1,68 @@
+from unittest import TestCase, main
+
+from asian_options import AsianOption, AsianStrike, AsianStrikeError
+from black_scholes import get_option_prices
+from option import OptionType, OptionTypeError
+
+
+class AsianOptionsTestCase(TestCase):
+
+    def setUp(self):
+        self.asian = AsianOption(100, 100, 0.08, 1, 0.3, 0.04, fixings=12)
+
+    def test_geometric_price(self):
+        '''Q: geometric average options, spot price 100, strike price 100, risk free interest rate 8%,
+        cost of carry 4%, expiry 1 year, volatility 30%, 12 monthly fixings
+        A: fixed strike call 7.4961, put 6.1742, floating strike call 7.4363, put 4.9909'''
+        self.assertEqual(7.4961, self.asian.get_geometric_price(OptionType.CALL))
+        self.assertEqual(6.1742, self.asian.get_geometric_price(OptionType.PUT))
+        self.assertEqual(7.4363, self.asian.get_geometric_price(OptionType.CALL, AsianStrike.FLOATING))
+        self.assertEqual(4.9909, self.asian.get_geometric_price(OptionType.PUT, AsianStrike.FLOATING))
+
+    def test_one_fixing(self):
+        '''With one fixing at expiry, a fixed strike option is a European one and a floating strike one is worthless'''
+        asian = AsianOption(100, 95, 0.08, 1, 0.3, 0.04, fixings=[1])
+        for otype in (OptionType.CALL, OptionType.PUT):
+            self.assertEqual(round(get_option_prices(100, 95, 0.08, 1, 0.3, 0.04, otype), 4),
+                             asian.get_geometric_price(otype))
+            self.assertEqual(0, asian.get_geometric_price(otype, AsianStrike.FLOATING))
+            self.assertTrue(abs(asian.simulate(otype, AsianStrike.FLOATING, 1000, seed=1).get_price()) < 1e-12)
+
+    def test_simulate(self):
+        '''The control variate gives the same price as the plain simulation, 
+        with tens of times less variance for the same paths'''
+        for strike_type in (AsianStrike.FIXED, AsianStrike.FLOATING):
+            for otype in (OptionType.CALL, OptionType.PUT):
+                plain = self.asian.simulate(otype, strike_type, 100000, control_variate=False, seed=1)
+                cv = self.asian.simulate(otype, strike_type, 20000, seed=2)
+                tol = 4 * (plain.get_std_err()**2 + cv.get_std_err()**2) ** 0.5
+                self.assertTrue(abs(plain.get_price() - cv.get_price()) < tol)
+                self.assertTrue(cv.get_std_err() * 20000**0.5 * 5 < plain.get_std_err() * 100000**0.5)
+                self.assertEqual(0, plain.beta)
+                self.assertTrue(0.5 < cv.beta < 1.5)
+
+        # The arithmetic average is above the geometric one
+        call = self.asian.simulate(OptionType.CALL, AsianStrike.FIXED, 20000, seed=1)
+        self.assertTrue(call.get_price() > self.asian.get_geometric_price(OptionType.CALL))
+
+    def test_repeatable(self):
+        '''The same seed and chunk size give the same price. Chunk k uses the stream (seed, run_id, worker_id, k),
+        so another chunk size draws other numbers and gives another estimate, within its standard errors'''
+        results = [self.asian.simulate(OptionType.PUT, AsianStrike.FIXED, 30000, chunk_size=size, seed=7)
+                   for size in (10000, 10000, 30000)]
+        self.assertEqual(results[0].get_price(), results[1].get_price())
+        self.assertNotEqual(results[0].get_price(), results[2].get_price())
+        tol = 4 * (results[0].get_std_err()**2 + results[2].get_std_err()**2) ** 0.5
+        self.assertTrue(abs(results[0].get_price() - results[2].get_price()) < tol)
+        self.assertEqual(7, self.asian.simulate(OptionType.PUT, AsianStrike.FIXED, 1000, seed=7).seed)
+
+    def test_errors(self):
+        self.assertRaises(OptionTypeError, self.asian.simulate, 2, AsianStrike.FIXED, 1000)
+        self.assertRaises(AsianStrikeError, self.asian.simulate, OptionType.CALL, 2, 1000)
+        self.assertRaises(AsianStrikeError, self.asian.get_geometric_price, OptionType.CALL, 2)
+        self.assertRaises(AssertionError, AsianOption, 100, 100, 0.08, 1, 0.3, 0.04, [0.5, 0.25])
+        self.assertRaises(AssertionError, AsianOption, 100, 100, 0.08, 1, 0.3, 0.04, [0.5, 2])
+
+
+if __name__ == '__main__':
+    main()
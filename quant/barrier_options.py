@@ -84,11 +84,52 @@ Standard Barrier Options
     payoff = max(X - S, 0) if S >= H before T else K at hit
         X > H: p = B - D + F
         X < H: p = A - C + F
+
+3. Batch pricing
+    get_barrier_prices prices arrays of contracts. The contracts are grouped by case, and for each case only
+    the terms it needs are evaluated, e.g. F alone for an up-and-out call with X > H, and E and F not at all
+    without rebate. The factors shared by the terms, exp((b - r) * T), exp(-r * T), vol * sqrt(T) and 
+    (H / S)**2u, are computed once for each contract.
+
+    get_barrier_ladder prices many barrier levels and rebates of one underlying: the terms which don't depend 
+    on the barrier, e.g. A, are computed once for the whole ladder.
+
+    get_barrier_greeks returns the price, delta, gamma, vega and theta by central differences. The contracts
+    are grouped by case once, and each bump of spot, vol or expiry computes again only the factors which 
+    depend on it, e.g. a bump of vol keeps the discount factors and the forward. The base and the bumped
+    contracts of a case are then priced together.
+
+4. Discrete monitoring by simulation
+    BarrierOption.simulate steps the paths through a schedule of fixings t_1 < ... < t_n:
+
+        log(S(t_i)) = log(S(t_i-1)) + (b - vol**2 / 2) * dt + vol * sqrt(dt) * eps
+
+    Instead of knocking a path in or out, it keeps the probability that the path has not hit the barrier yet, 
+    so the payoff of a path is its expectation given the fixings. With BarrierMonitoring.BRIDGE the barrier is 
+    monitored continuously: given S(t_i-1) and S(t_i), both on the side of the spot, the path between them 
+    is a Brownian bridge which hits the barrier with probability
+
+        p = exp(-2 * log(S(t_i-1) / H) * log(S(t_i) / H) / (vol**2 * dt))
+
+    so a handful of fixings are as accurate as the formula, while checking the fixings only would need 
+    hundreds of them. With BarrierMonitoring.SHIFT the fixings are checked against the barrier shifted 
+    towards the spot by the Broadie-Glasserman-Kou correction
+
+        H * exp(ita * beta * vol * sqrt(dt)),   beta = 0.5826
+
+    which is only accurate when the barrier is further from the spot than about vol * sqrt(dt).
+
+    An out rebate is paid at the fixing the barrier is hit at, or for BRIDGE in the middle of the interval.
 '''
 
+from copy import copy
 from math import exp, log, sqrt
 
-from option import Option, OptionType, cdf
+import numpy as np
+
+from monte_carlo import MonteCarloResult, get_fixings, get_time_steps, iter_chunks
+from option import Option, OptionType, OptionTypeError, cdf, cdf_array, norminv_array, round_array
+from random_streams import RandomStreams, get_open_uniforms
 
 
 
@@ -97,6 +138,15 @@ class BarrierType(object):
     OUT = 1
 
 
+class BarrierMonitoring(object):
+    DISCRETE = 0 # the barrier is only checked at the fixings
+    BRIDGE = 1   # continuously, by the probability that the Brownian bridge between the fixings hits it
+    SHIFT = 2    # continuously, by checking the fixings against the shifted barrier
+
+
+BGK_BETA = 0.5826 # -zeta(1/2) / sqrt(2 * pi), the barrier shift of Broadie, Glasserman and Kou
+
+
 class BarrierTypeError(Exception):
     def __str__(self):
         return 'Unknown barrier type. It must be BarrierType.IN or BarrierType.OUT'
@@ -221,7 +271,341 @@ class BarrierOption(Option):
             raise BarrierTypeError
         
         return round(payoff, 4)
+
+    def get_greeks(self, opt_type, bar_type, round_digit=4):
+        '''Return a dict of the price and the Greeks in BARRIER_GREEKS, see get_barrier_greeks'''
+        greeks = get_barrier_greeks(self.spot, self.strike, self.rate, self.expiry, self.vol, self.coc, 
+                                    self.rebate, self.bar, opt_type, bar_type)
+
+        return dict((k, round(float(v), round_digit)) for k, v in greeks.iteritems())
+
+    def simulate(self, opt_type, bar_type, fixings, simu_num, monitoring=BarrierMonitoring.DISCRETE, 
+                 chunk_size=10000, seed=None, run_id=0, worker_id=0):
+        '''Price the option by Monte Carlo simulation with the barrier monitored at fixings, 
+        and return a MonteCarloResult.
+
+        fixings: the number of fixings evenly spaced until expiry, or an increasing sequence of fixing times 
+                 in (0, expiry]. The paths are also stepped to expiry if it is not a fixing.
+        monitoring: BarrierMonitoring.DISCRETE prices the option as it is written on the fixings; 
+                    BRIDGE and SHIFT price the continuously monitored option as get_payoff does, see 4. above
+        chunk_size, seed, run_id, worker_id: as MonteCarlo.simulate, see monte_carlo.iter_chunks
+        '''
+        if opt_type == OptionType.CALL:
+            fi = 1
+        elif opt_type == OptionType.PUT:
+            fi = -1
+        else:
+            raise OptionTypeError
+        if bar_type not in (BarrierType.IN, BarrierType.OUT):
+            raise BarrierTypeError
+
+        fixing_times = get_fixings(fixings, self.expiry)
+        times, dts, fixed = get_time_steps(fixing_times, self.expiry)
+        # With the bridge the barrier is also checked on the step to expiry
+        checked = [check or monitoring == BarrierMonitoring.BRIDGE for check in fixed]
+
+        ita = 1 if self.spot > self.bar else -1 # down or up
+        log_bar = log(self.bar)
+        if monitoring == BarrierMonitoring.SHIFT:
+            log_bar += ita * BGK_BETA * self.vol * sqrt(self.expiry / len(fixing_times))
+        
+        streams = RandomStreams(seed, run_id)
+        result = MonteCarloResult(exp(- self.rate * self.expiry))
+        for num, rs in iter_chunks(simu_num, chunk_size, streams, worker_id):
+            log_s = np.empty(num)
+            log_s.fill(log(self.spot))
+            alive = np.ones(num) # the probability that the path has not hit the barrier
+            rebates = np.zeros(num)
+
+            for t, dt, check in zip(times, dts, checked):
+                eps = norminv_array(get_open_uniforms(rs, num))
+                dist = ita * (log_s - log_bar) # positive on the side of the spot
+                log_s += (self.coc - self.vol**2 / 2) * dt + self.vol * sqrt(dt) * eps
+                if not check:
+                    continue
+
+                new_dist = ita * (log_s - log_bar)
+                if monitoring == BarrierMonitoring.BRIDGE:
+                    hit = np.where((dist > 0) & (new_dist > 0), 
+                                   np.exp(-2 * dist * new_dist / (self.vol**2 * dt)), 1.0)
+                else:
+                    hit = (new_dist <= 0).astype(float)
+                hit *= alive
+                alive -= hit
+                if bar_type == BarrierType.OUT and self.rebate:
+                    hit_time = t - dt / 2 if monitoring == BarrierMonitoring.BRIDGE else t
+                    rebates += hit * (self.rebate * exp(self.rate * (self.expiry - hit_time)))
+
+            payoffs = np.exp(log_s)
+            payoffs -= self.strike
+            payoffs *= fi
+            np.maximum(payoffs, 0, out=payoffs)
+            if bar_type == BarrierType.OUT:
+                payoffs *= alive
+                payoffs += rebates
+            else:
+                payoffs *= 1 - alive
+                payoffs += alive * self.rebate
+            result.add(payoffs)
+
+        result.seed = streams.seed
+        return result
         
+
+# The terms of each case: (bar_type, opt_type, S > H, X > H): ((sign, term), ...)
+_CASES = {(BarrierType.IN, OptionType.CALL, True, True):    ((1, 'C'), (1, 'E')),
+          (BarrierType.IN, OptionType.CALL, True, False):   ((1, 'A'), (-1, 'B'), (1, 'D'), (1, 'E')),
+          (BarrierType.IN, OptionType.CALL, False, True):   ((1, 'A'), (1, 'E')),
+          (BarrierType.IN, OptionType.CALL, False, False):  ((1, 'B'), (-1, 'C'), (1, 'D'), (1, 'E')),
+          (BarrierType.IN, OptionType.PUT, True, True):     ((1, 'B'), (-1, 'C'), (1, 'D'), (1, 'E')),
+          (BarrierType.IN, OptionType.PUT, True, False):    ((1, 'A'), (1, 'E')),
+          (BarrierType.IN, OptionType.PUT, False, True):    ((1, 'A'), (-1, 'B'), (1, 'D'), (1, 'E')),
+          (BarrierType.IN, OptionType.PUT, False, False):   ((1, 'C'), (1, 'E')),
+          (BarrierType.OUT, OptionType.CALL, True, True):   ((1, 'A'), (-1, 'C'), (1, 'F')),
+          (BarrierType.OUT, OptionType.CALL, True, False):  ((1, 'B'), (-1, 'D'), (1, 'F')),
+          (BarrierType.OUT, OptionType.CALL, False, True):  ((1, 'F'),),
+          (BarrierType.OUT, OptionType.CALL, False, False): ((1, 'A'), (-1, 'B'), (1, 'C'), (-1, 'D'), (1, 'F')),
+          (BarrierType.OUT, OptionType.PUT, True, True):    ((1, 'A'), (-1, 'B'), (1, 'C'), (-1, 'D'), (1, 'F')),
+          (BarrierType.OUT, OptionType.PUT, True, False):   ((1, 'F'),),
+          (BarrierType.OUT, OptionType.PUT, False, True):   ((1, 'B'), (-1, 'D'), (1, 'F')),
+          (BarrierType.OUT, OptionType.PUT, False, False):  ((1, 'A'), (-1, 'C'), (1, 'F')),
+         }
+
+
+class _BarrierTerms(object):
+    '''The terms A - F of a batch of contracts of the same case, i.e. with the same ita and fi.
+    The shared factors are computed once, and the others only when a term needs them.'''
+
+    ARRAYS = ('spot', 'strike', 'rate', 'coc', 'rebate', 'bar', 'expiry', 'vol', 'disc', 'strike_disc', 'fwd', 
+              'vol_sq', 'u', 'vol_sqrt_t', 'drift', 'log_h', 'h_2u') # the inputs and the shared factors
+
+    def __init__(self, spot, strike, rate, expiry, vol, coc, rebate, bar, ita, fi):
+        self.strike, self.rate, self.coc, self.rebate, self.bar = strike, rate, coc, rebate, bar
+        self.ita, self.fi = ita, fi
+        self.spot = self.expiry = self.vol = None
+        self._set_factors(spot, expiry, vol)
+
+    def _set_factors(self, spot, expiry, vol):
+        '''Set spot, expiry and vol, and compute the shared factors which depend on the ones which changed'''
+        new_spot, new_expiry, new_vol = spot is not self.spot, expiry is not self.expiry, vol is not self.vol
+        self.spot, self.expiry, self.vol = spot, expiry, vol
+
+        if new_expiry:
+            self.disc = np.exp(- self.rate * expiry)                 # exp(-r * T)
+            self.strike_disc = self.strike * self.disc               # X * exp(-r * T)
+        if new_spot or new_expiry:
+            self.fwd = spot * np.exp((self.coc - self.rate) * expiry) # S * exp((b - r) * T)
+        if new_vol:
+            self.vol_sq = vol ** 2
+            self.u = (self.coc - self.vol_sq / 2) / self.vol_sq
+        if new_vol or new_expiry:
+            self.vol_sqrt_t = vol * np.sqrt(expiry)
+            self.drift = (1 + self.u) * self.vol_sqrt_t
+        if new_spot:
+            self.log_h = np.log(self.bar / spot)                     # log(H / S)
+        if new_spot or new_vol:
+            self.h_2u = np.exp(2 * self.u * self.log_h)              # (H / S)**2u
+        self._x2 = self._y2 = None
+
+    def get_bumped(self, spot=None, expiry=None, vol=None):
+        '''Return the terms of the same contracts with spot, expiry or vol replaced.
+        The factors which don't depend on them are shared, not computed again.'''
+        bumped = copy(self)
+        bumped._set_factors(self.spot if spot is None else spot, self.expiry if expiry is None else expiry, 
+                            self.vol if vol is None else vol)
+        return bumped
+
+    def stack(self, others):
+        '''Return the terms of the contracts of self followed by those of others, of the same case, 
+        so that each term is evaluated once for all of them'''
+        stacked = copy(self)
+        for name in _BarrierTerms.ARRAYS:
+            setattr(stacked, name, np.concatenate([getattr(terms, name) for terms in [self] + others]))
+        stacked._x2 = stacked._y2 = None
+        return stacked
+
+    def get_term(self, name):
+        return getattr(self, '_get_' + name)()
+
+    def _get_x2(self):
+        if self._x2 is None:
+            self._x2 = - self.log_h / self.vol_sqrt_t + self.drift
+        return self._x2
+
+    def _get_y2(self):
+        if self._y2 is None:
+            self._y2 = self.log_h / self.vol_sqrt_t + self.drift
+        return self._y2
+
+    def _get_vanilla_term(self, x):
+        '''A and B'''
+        fi = self.fi
+        return fi * (self.fwd * cdf_array(fi * x) - self.strike_disc * cdf_array(fi * (x - self.vol_sqrt_t)))
+
+    def _get_reflected_term(self, y):
+        '''C and D'''
+        ita = self.ita
+        return self.fi * self.h_2u * (self.fwd * np.exp(2 * self.log_h) * cdf_array(ita * y) - 
+                                      self.strike_disc * cdf_array(ita * (y - self.vol_sqrt_t)))
+
+    def _get_A(self):
+        return self._get_vanilla_term(np.log(self.spot / self.strike) / self.vol_sqrt_t + self.drift)
+
+    def _get_B(self):
+        return self._get_vanilla_term(self._get_x2())
+
+    def _get_C(self):
+        return self._get_reflected_term((2 * self.log_h + np.log(self.spot / self.strike)) / self.vol_sqrt_t + 
+                                        self.drift)
+
+    def _get_D(self):
+        return self._get_reflected_term(self._get_y2())
+
+    def _get_E(self):
+        if not self.rebate.any():
+            return 0
+        ita = self.ita
+        return self.rebate * self.disc * (cdf_array(ita * (self._get_x2() - self.vol_sqrt_t)) - 
+                                          self.h_2u * cdf_array(ita * (self._get_y2() - self.vol_sqrt_t)))
+
+    def _get_F(self):
+        if not self.rebate.any():
+            return 0
+        ita = self.ita
+        la = np.sqrt(self.u ** 2 + 2 * self.rate / self.vol_sq)
+        z = self.log_h / self.vol_sqrt_t + la * self.vol_sqrt_t
+        return self.rebate * (np.exp((self.u + la) * self.log_h) * cdf_array(ita * z) + 
+                              np.exp((self.u - la) * self.log_h) * cdf_array(ita * (z - 2 * la * self.vol_sqrt_t)))
+
+
+def _get_cases(spot, strike, rate, expiry, vol, coc, rebate, bar, opt_type, bar_type):
+    '''Broadcast the arguments of a batch of contracts against each other and group the contracts by case.
+    Return the shape of the batch and, for each case, the indices of its contracts in the flattened batch,
+    its signed terms and the _BarrierTerms of its contracts.'''
+    opt_type, bar_type = np.asarray(opt_type), np.asarray(bar_type)
+    if not ((opt_type == OptionType.CALL) | (opt_type == OptionType.PUT)).all():
+        raise OptionTypeError
+    if not ((bar_type == BarrierType.IN) | (bar_type == BarrierType.OUT)).all():
+        raise BarrierTypeError
+
+    args = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in 
+                                 (spot, strike, rate, expiry, vol, coc, rebate, bar)] + [opt_type, bar_type])
+    shape = args[0].shape
+    args = [v.ravel() for v in args]
+    spot, strike, bar, opt_type, bar_type = args[0], args[1], args[7], args[8], args[9]
+    is_down = spot > bar
+    strike_above = strike > bar
+
+    cases = []
+    for (case_bar_type, case_opt_type, down, above), terms in _CASES.iteritems():
+        idx = np.flatnonzero((bar_type == case_bar_type) & (opt_type == case_opt_type) & 
+                             (is_down == down) & (strike_above == above))
+        if not len(idx):
+            continue
+
+        ita = 1 if down else -1
+        fi = 1 if case_opt_type == OptionType.CALL else -1
+        cases.append((idx, terms, _BarrierTerms(*[v[idx] for v in args[:8]] + [ita, fi])))
+
+    return shape, cases
+
+
+def _sum_terms(terms, case_terms):
+    '''Return the price of the contracts of case_terms, the sum of their signed terms'''
+    return sum(sign * case_terms.get_term(name) for sign, name in terms)
+
+
+def get_barrier_prices(spot, strike, rate, expiry, vol, coc, rebate, bar, opt_type, bar_type, round_digit=None):
+    '''Price a whole batch of barrier options, the same as BarrierOption.get_payoff for each of them.
+
+    Every argument can be a scalar or an array, they are broadcast against each other.
+    opt_type is OptionType.CALL, OptionType.PUT or an array of them, bar_type is BarrierType.IN, 
+    BarrierType.OUT or an array of them.
+    The prices are returned as an array; if round_digit is given they are rounded as get_payoff does.
+    '''
+    shape, cases = _get_cases(spot, strike, rate, expiry, vol, coc, rebate, bar, opt_type, bar_type)
+    price = np.empty(shape)
+    flat_price = price.reshape(-1)
+    for idx, terms, case_terms in cases:
+        flat_price[idx] = _sum_terms(terms, case_terms)
+
+    if round_digit is not None:
+        price = round_array(price, round_digit)
+
+    return price
+
+
+def get_barrier_ladder(spot, strike, rate, expiry, vol, coc, rebate, bar, opt_type, bar_type, round_digit=None):
+    '''Price the barrier options of one underlying and strike on a ladder of barrier levels bar and rebates
+    rebate, which are broadcast against each other; the other arguments are scalars.
+    Return an array of prices, the same as get_barrier_prices.
+
+    Everything which doesn't depend on the barrier, i.e. the discount factors, u, la and the term A, 
+    is computed once for each case instead of once for each barrier level.
+    '''
+    if opt_type not in (OptionType.CALL, OptionType.PUT):
+        raise OptionTypeError
+    if bar_type not in (BarrierType.IN, BarrierType.OUT):
+        raise BarrierTypeError
+
+    rebate, bar = np.broadcast_arrays(np.asarray(rebate, dtype=float), np.asarray(bar, dtype=float))
+    shape = bar.shape
+    rebate, bar = rebate.ravel(), bar.ravel()
+    fi = 1 if opt_type == OptionType.CALL else -1
+
+    price = np.empty(bar.shape)
+    for down in (True, False):
+        for above in (True, False):
+            idx = np.flatnonzero(((spot > bar) == down) & ((strike > bar) == above))
+            if not len(idx):
+                continue
+
+            # A scalar underlying with arrays of barriers: the barrier-independent factors stay scalars
+            case_terms = _BarrierTerms(float(spot), float(strike), float(rate), float(expiry), float(vol), 
+                                       float(coc), rebate[idx], bar[idx], 1 if down else -1, fi)
+            price[idx] = _sum_terms(_CASES[bar_type, opt_type, down, above], case_terms)
+
+    price = price.reshape(shape)
+    if round_digit is not None:
+        price = round_array(price, round_digit)
+
+    return price
+
+
+BARRIER_GREEKS = ('price', 'delta', 'gamma', 'vega', 'theta')
+
+
+def get_barrier_greeks(spot, strike, rate, expiry, vol, coc, rebate, bar, opt_type, bar_type, bump=1e-4):
+    '''Calculate the price and the Greeks in BARRIER_GREEKS for one contract or a batch of contracts,
+    with the same arguments as get_barrier_prices. A dict of arrays keyed by BARRIER_GREEKS is returned,
+    with the same conventions as black_scholes_greeks: vega per unit of vol, theta per year of time decay.
+
+    The Greeks are central differences of the price with relative bumps of spot, vol and expiry by bump.
+    The bumped contracts keep the case of the base contract, and share with it the factors which don't
+    depend on the bumped argument (see _BarrierTerms.get_bumped). The base and the 6 bumped contracts of 
+    a case are stacked, so each of its terms is evaluated once.
+    A spot within a bump of the barrier gives meaningless delta and gamma.
+    '''
+    shape, cases = _get_cases(spot, strike, rate, expiry, vol, coc, rebate, bar, opt_type, bar_type)
+    greeks = dict((greek, np.empty(shape)) for greek in BARRIER_GREEKS)
+    flat_greeks = dict((greek, value.reshape(-1)) for greek, value in greeks.iteritems())
+    for idx, terms, base in cases:
+        ds, dv, dt = base.spot * bump, base.vol * bump, base.expiry * bump
+        # base, spot up, spot down, vol up, vol down, expiry up, expiry down
+        stacked = base.stack([base.get_bumped(spot=base.spot + ds), base.get_bumped(spot=base.spot - ds), 
+                              base.get_bumped(vol=base.vol + dv), base.get_bumped(vol=base.vol - dv),
+                              base.get_bumped(expiry=base.expiry + dt), base.get_bumped(expiry=base.expiry - dt)])
+        prices = np.empty(7 * len(idx))
+        prices[:] = _sum_terms(terms, stacked)
+        price, up, down, vol_up, vol_down, later, sooner = prices.reshape(7, len(idx))
+
+        flat_greeks['price'][idx] = price
+        flat_greeks['delta'][idx] = (up - down) / (2 * ds)
+        flat_greeks['gamma'][idx] = (up - 2 * price + down) / ds ** 2
+        flat_greeks['vega'][idx] = (vol_up - vol_down) / (2 * dv)
+        flat_greeks['theta'][idx] = (sooner - later) / (2 * dt)
+
+    return greeks
         
         
 if __name__ == '__main__':
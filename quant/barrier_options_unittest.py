@@ -1,8 +1,15 @@
-from barrier_options import BarrierOption, BarrierType
-from option import OptionType
+from math import exp, sqrt
+
+from barrier_options import (BarrierOption, BarrierType, BarrierTypeError, BarrierMonitoring, BGK_BETA, 
+                             BARRIER_GREEKS, get_barrier_prices, get_barrier_ladder, get_barrier_greeks)
+from black_scholes import get_option_prices
+from black_scholes_greeks import get_greeks
+from option import OptionType, OptionTypeError
 
 from unittest import TestCase, main
 
+import numpy as np
+
 class BarrierOptionsTestCase(TestCase):
     
     def test_all(self):
@@ -35,6 +42,129 @@ class BarrierOptionsTestCase(TestCase):
                         self.assertEqual(bo.get_payoff(otype, btype), values[i])
                         i += 1
 
+        # The whole table at once
+        prices = get_barrier_prices(spot, np.array(strikes), rate, expiry, vol, coc, rebate, 
+                                    np.array(bars)[:, np.newaxis], np.array(opt_types)[:, np.newaxis, np.newaxis, np.newaxis], 
+                                    np.array(bar_types)[:, np.newaxis, np.newaxis], round_digit=4)
+        self.assertEqual((2, 2, 3, 3), prices.shape)
+        self.assertEqual(list(values), list(prices.ravel()))
+
+    def test_batch(self):
+        '''A batch of random contracts, up and down, with and without rebate, are priced the same as one by one'''
+        rs = np.random.RandomState(3)
+        num = 400
+        args = (rs.uniform(80, 120, num), rs.uniform(80, 120, num), rs.uniform(0, 0.1, num), rs.uniform(0.1, 2, num), 
+                rs.uniform(0.1, 0.5, num), rs.uniform(-0.05, 0.1, num), rs.choice([0, 3], num), rs.uniform(80, 120, num))
+        opt_types, bar_types = rs.randint(2, size=num), rs.randint(2, size=num)
+        prices = get_barrier_prices(*args + (opt_types, bar_types))
+        for i in xrange(num):
+            bo = BarrierOption(*[v[i] for v in args])
+            self.assertAlmostEqual(bo.get_payoff(opt_types[i], bar_types[i]), prices[i], 4)
+
+        # In + out = vanilla without rebate
+        zero = np.zeros(num)
+        vanilla = get_barrier_prices(*args[:6] + (zero, args[7], opt_types, BarrierType.IN)) + \
+                  get_barrier_prices(*args[:6] + (zero, args[7], opt_types, BarrierType.OUT))
+        np.testing.assert_allclose(get_option_prices(*args[:6] + (opt_types,)), vanilla, rtol=1e-10, atol=1e-10)
+
+        self.assertRaises(OptionTypeError, get_barrier_prices, 100, 90, 0.08, 0.5, 0.25, 0.04, 3, 95, 2, BarrierType.IN)
+        self.assertRaises(BarrierTypeError, get_barrier_prices, 100, 90, 0.08, 0.5, 0.25, 0.04, 3, 95, OptionType.PUT, 2)
+
+    def test_ladder(self):
+        '''The table of test_all, one ladder of barriers for each strike'''
+        values = iter((9.0246, 6.7924, 4.8759, 3.0, 3.0, 3.0, 2.6789, 2.3580, 2.3453,
+                       7.7627, 4.0109, 2.0576, 13.8333, 7.8494, 3.9795, 14.1112, 8.4482, 4.5910,
+                       2.2798, 2.2947, 2.6252, 3.0, 3.0, 3.0, 3.7760, 5.4932, 7.5187,
+                       2.9586, 6.5677, 11.9752, 2.2845, 5.9085, 11.6465, 1.4653, 3.3721, 7.0846))
+        for otype in (OptionType.CALL, OptionType.PUT):
+            for btype in (BarrierType.OUT, BarrierType.IN):
+                expected = np.array([[next(values) for strike in (90, 100, 110)] for bar in (95, 100, 105)])
+                for j, strike in enumerate((90, 100, 110)):
+                    self.assertEqual(list(expected[:, j]), 
+                                     list(get_barrier_ladder(100, strike, 0.08, 0.5, 0.25, 0.04, 3, [95, 100, 105], 
+                                                             otype, btype, round_digit=4)))
+
+        # Rebates and barriers on both sides of the spot and the strike
+        bars = np.linspace(80, 120, 41)
+        rebates = np.array([[0], [3]])
+        for otype in (OptionType.CALL, OptionType.PUT):
+            for btype in (BarrierType.OUT, BarrierType.IN):
+                np.testing.assert_allclose(get_barrier_prices(100, 97, 0.08, 0.5, 0.25, 0.04, rebates, bars, otype, btype),
+                                           get_barrier_ladder(100, 97, 0.08, 0.5, 0.25, 0.04, rebates, bars, otype, btype),
+                                           rtol=1e-12, atol=1e-12)
+        self.assertRaises(BarrierTypeError, get_barrier_ladder, 100, 97, 0.08, 0.5, 0.25, 0.04, 3, bars, OptionType.PUT, 2)
+
+    def test_greeks(self):
+        '''A barrier far away: the Black-Scholes Greeks. In + out without rebate: the Black-Scholes Greeks'''
+        for otype in (OptionType.CALL, OptionType.PUT):
+            expected = get_greeks(100, [90, 100, 110], 0.08, 0.5, 0.25, 0.04, otype)
+            far = get_barrier_greeks(100, [90, 100, 110], 0.08, 0.5, 0.25, 0.04, 0, 1e-3, otype, BarrierType.OUT)
+            in_ = get_barrier_greeks(100, [90, 100, 110], 0.08, 0.5, 0.25, 0.04, 0, 95, otype, BarrierType.IN)
+            out = get_barrier_greeks(100, [90, 100, 110], 0.08, 0.5, 0.25, 0.04, 0, 95, otype, BarrierType.OUT)
+            for greek in BARRIER_GREEKS:
+                np.testing.assert_allclose(expected[greek], far[greek], rtol=1e-5, atol=1e-6)
+                np.testing.assert_allclose(expected[greek], in_[greek] + out[greek], rtol=1e-5, atol=1e-6)
+
+        # Down-and-out call with rebate: the price of the table and a delta between 0 and 1
+        greeks = BarrierOption(100, 100, 0.08, 0.5, 0.25, 0.04, 3, 95).get_greeks(OptionType.CALL, BarrierType.OUT)
+        self.assertEqual(sorted(BARRIER_GREEKS), sorted(greeks))
+        self.assertEqual(6.7924, greeks['price'])
+        self.assertTrue(0 < greeks['delta'] < 1)
+
+    def test_greeks_batch(self):
+        '''A batch of contracts of every case: the central differences of get_barrier_prices, in the batch shape'''
+        spot = np.array([[100], [90]])
+        strike, bar = np.array([90, 100, 110] * 4), np.repeat([85, 95, 105, 115], 3)
+        args = (0.08, 0.5, 0.25, 0.04, 3, bar)
+        for otype in (OptionType.CALL, OptionType.PUT):
+            for btype in (BarrierType.IN, BarrierType.OUT):
+                greeks = get_barrier_greeks(spot, strike, *args + (otype, btype))
+                self.assertEqual((2, 12), greeks['delta'].shape)
+                ds = spot * 1e-4
+                up = get_barrier_prices(spot + ds, strike, *args + (otype, btype))
+                down = get_barrier_prices(spot - ds, strike, *args + (otype, btype))
+                np.testing.assert_allclose(get_barrier_prices(spot, strike, *args + (otype, btype)), greeks['price'])
+                np.testing.assert_allclose((up - down) / (2 * ds), greeks['delta'], rtol=1e-8, atol=1e-10)
+                vol_up = get_barrier_prices(spot, strike, 0.08, 0.5, 0.25 * (1 + 1e-4), 0.04, 3, bar, otype, btype)
+                vol_down = get_barrier_prices(spot, strike, 0.08, 0.5, 0.25 * (1 - 1e-4), 0.04, 3, bar, otype, btype)
+                np.testing.assert_allclose((vol_up - vol_down) / (2 * 0.25e-4), greeks['vega'], rtol=1e-8, atol=1e-10)
+
+    def test_simulate_bridge(self):
+        '''With the Brownian bridge 4 fixings are enough to price continuously monitored options, 
+        down and up, in and out, with rebate'''
+        for rebate, bar in ((0, 95), (3, 95), (3, 105)):
+            bo = BarrierOption(100, 100, 0.08, 0.5, 0.25, 0.04, rebate, bar)
+            for otype in (OptionType.CALL, OptionType.PUT):
+                for btype in (BarrierType.OUT, BarrierType.IN):
+                    result = bo.simulate(otype, btype, 4, 200000, BarrierMonitoring.BRIDGE, seed=1)
+                    self.assertTrue(abs(result.get_price() - bo.get_payoff(otype, btype)) < 
+                                    4 * result.get_std_err() + 0.003)
+
+    def test_simulate_discrete(self):
+        '''Q: down-and-out call, spot price 100, strike price 100, barrier 90 checked on 12 monthly fixings
+        A: the price of the continuously monitored option with the barrier shifted down by Broadie-Glasserman-Kou,
+           and the barrier shifted up prices the continuously monitored option from the fixings.
+           The shift is not accurate for a barrier closer to the spot than about vol * sqrt(dt)'''
+        bo = BarrierOption(100, 100, 0.08, 1, 0.25, 0.04, 0, 90)
+        result = bo.simulate(OptionType.CALL, BarrierType.OUT, 12, 200000, seed=2)
+        shifted_bar = 90 * exp(- BGK_BETA * 0.25 * sqrt(1 / 12.0))
+        self.assertAlmostEqual(get_barrier_prices(100, 100, 0.08, 1, 0.25, 0.04, 0, shifted_bar, 
+                                                  OptionType.CALL, BarrierType.OUT), result.get_price(), 1)
+        self.assertTrue(result.get_price() > bo.get_payoff(OptionType.CALL, BarrierType.OUT) + 0.3)
+
+        result = bo.simulate(OptionType.CALL, BarrierType.OUT, 12, 200000, BarrierMonitoring.SHIFT, seed=2)
+        self.assertAlmostEqual(bo.get_payoff(OptionType.CALL, BarrierType.OUT), result.get_price(), 1)
+
+        # The same fixings given as times, in chunks
+        a = bo.simulate(OptionType.PUT, BarrierType.IN, 12, 30000, seed=3)
+        b = bo.simulate(OptionType.PUT, BarrierType.IN, np.arange(1, 13) / 12.0, 30000, chunk_size=10000, seed=3)
+        self.assertEqual(30000, b.num)
+        self.assertAlmostEqual(a.get_price(), b.get_price(), 10)
+        self.assertEqual(3, b.seed)
+
+        self.assertRaises(BarrierTypeError, bo.simulate, OptionType.PUT, 2, 12, 1000)
+        self.assertRaises(OptionTypeError, bo.simulate, 2, BarrierType.IN, 12, 1000)
+        self.assertRaises(AssertionError, bo.simulate, OptionType.PUT, BarrierType.IN, [0.5, 0.2], 1000)
 
 
 if __name__ == '__main__':
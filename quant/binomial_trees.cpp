@@ -1,105 +1,162 @@
-
 /*
  * This is the c++ implementation of binomial trees - counter part of binomial_trees.py
+ *
+ * It is built as the extension module quant._binomial_trees by setup.py:
+ *     python setup.py build_ext --inplace
+ *
+ * and used by binomial_trees.get_lattice_prices when it is available.
  */
- 
- 
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <algorithm>
 #include <cmath>
-#include <list>
+#include <cstring>
 #include <vector>
-#include <string>
-#include <iostream>
-//from black_scholes import OptionType
 
-class BinomialTree
+
+/*
+ * Roll back the CRR trees of n contracts with the same number of steps and write their prices to out.
+ * z is 1 for a call and -1 for a put. The spot prices and probabilities are the same as
+ * binomial_trees.get_lattice_prices.
+ */
+static void price_lattices(const double *spot, const double *strike, const double *rate, const double *expiry,
+                           const double *vol, const double *cost_of_carry, const double *z,
+                           Py_ssize_t n, int steps, bool american, double *out)
+{
+    std::vector<double> opt(steps + 1);
+    std::vector<double> spots(2 * steps + 1);
+
+    for (Py_ssize_t k = 0; k < n; ++k)
+    {
+        // Calculate delta_t, u, d, p and the discount factor between two steps
+        double delta_t = expiry[k] / steps;
+        double vol_sqrt_t = vol[k] * std::sqrt(delta_t);
+        double u = std::exp(vol_sqrt_t);
+        double d = 1 / u;
+        double p = (std::exp(cost_of_carry[k] * delta_t) - d) / (u - d);
+        double disc = std::exp(- rate[k] * delta_t);
+        double p_up = p * disc;
+        double p_down = (1 - p) * disc;
+
+        // Node i of level lv has lv - i up and i down movements, its spot price is spots[steps + lv - 2 * i]
+        for (int j = 0; j <= 2 * steps; ++j)
+            spots[j] = spot[k] * std::exp(vol_sqrt_t * (j - steps));
+        for (int i = 0; i <= steps; ++i)
+            opt[i] = std::max(z[k] * (spots[2 * (steps - i)] - strike[k]), 0.0);
+
+        // Calculate values from bottom to root, overwriting the level below
+        for (int lv = steps - 1; lv >= 0; --lv)
+        {
+            for (int i = 0; i <= lv; ++i)
+            {
+                opt[i] = p_up * opt[i] + p_down * opt[i + 1];
+                if (american)
+                    opt[i] = std::max(opt[i], z[k] * (spots[steps + lv - 2 * i] - strike[k]));
+            }
+        }
+
+        out[k] = opt[0];
+    }
+}
+
+
+/*
+ * Get a C contiguous buffer of n doubles from obj, e.g. a numpy array of float64
+ */
+static bool get_buffer(PyObject *obj, Py_buffer *view, Py_ssize_t n, bool writable)
 {
-	public:
-		double get_option_price(type, round_digit=4);
-		BinomialTree(double spot, double strike, double rate, double expiry, double vol, int steps);
-	private:
-		double get_opt_4_last_step(spot, type);
-    	double get_opt_4_prev_step(up_opt, down_opt);
-    	double strike;
-    	double a; // time value of money between two steps
-    	double p; // probability of an up movement
-    	list tree;
+    int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | (writable ? PyBUF_WRITABLE : 0);
+    if (PyObject_GetBuffer(obj, view, flags) < 0)
+        return false;
+
+    if (view->itemsize != sizeof(double) || !view->format || std::strcmp(view->format, "d") != 0 ||
+        view->len != n * (Py_ssize_t)sizeof(double))
+    {
+        PyErr_Format(PyExc_ValueError, "expected a contiguous buffer of %zd doubles", n);
+        PyBuffer_Release(view);
+        return false;
+    }
+
+    return true;
+}
+
+
+static PyObject *py_price_lattices(PyObject *self, PyObject *args)
+{
+    const int arg_num = 7; // spot, strike, rate, expiry, vol, cost_of_carry, z
+    PyObject *objs[arg_num];
+    PyObject *out_obj;
+    int steps, american;
+
+    if (!PyArg_ParseTuple(args, "OOOOOOOiiO:price_lattices", &objs[0], &objs[1], &objs[2], &objs[3], &objs[4],
+                          &objs[5], &objs[6], &steps, &american, &out_obj))
+        return NULL;
+    if (steps <= 0)
+        return PyErr_Format(PyExc_ValueError, "steps must be positive, got %d", steps);
+
+    Py_buffer out;
+    if (PyObject_GetBuffer(out_obj, &out, PyBUF_C_CONTIGUOUS | PyBUF_WRITABLE) < 0)
+        return NULL;
+    Py_ssize_t n = out.len / (Py_ssize_t)sizeof(double);
+    PyBuffer_Release(&out);
+    if (!get_buffer(out_obj, &out, n, true))
+        return NULL;
+
+    Py_buffer views[arg_num];
+    int got = 0;
+    for (; got < arg_num; ++got)
+        if (!get_buffer(objs[got], &views[got], n, false))
+            break;
+
+    if (got == arg_num)
+    {
+        const double *bufs[arg_num];
+        for (int i = 0; i < arg_num; ++i)
+            bufs[i] = (const double *)views[i].buf;
+
+        Py_BEGIN_ALLOW_THREADS
+        price_lattices(bufs[0], bufs[1], bufs[2], bufs[3], bufs[4], bufs[5], bufs[6], n, steps, american != 0,
+                       (double *)out.buf);
+        Py_END_ALLOW_THREADS
+    }
+
+    for (int i = 0; i < got; ++i)
+        PyBuffer_Release(&views[i]);
+    PyBuffer_Release(&out);
+
+    if (got < arg_num)
+        return NULL;
+    Py_RETURN_NONE;
+}
+
+
+static PyMethodDef methods[] = {
+    {"price_lattices", py_price_lattices, METH_VARARGS,
+     "price_lattices(spot, strike, rate, expiry, vol, cost_of_carry, z, steps, american, out)\n\n"
+     "Price n contracts by CRR trees and write the prices to out. Every argument but steps and american\n"
+     "is a contiguous buffer of n doubles, and z is 1 for a call and -1 for a put."},
+    {NULL, NULL, 0, NULL}
 };
-		
-BinomialTree::BinomialTree(double spot, double strike, double rate, double expiry, double vol, int steps)
+
+
+#if PY_MAJOR_VERSION >= 3
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, "_binomial_trees", "Native binomial trees", -1, methods
+};
+
+PyMODINIT_FUNC PyInit__binomial_trees(void)
 {
-    double this->strike = strike
-    
-    // Calculate delta_t, u, d, a and p
-    double delta_t = expiry * / steps
-    double u = exp(vol * sqrt(delta_t))
-    double d = 1 / u
-    double this->a = exp(rate * delta_t)
-    double this->p = (this.a - d) / (u - d)
-    //print 'u is {}, d is {}, a is {}, p is {}'.format(u, d, self.a, self.p)
-
-    // Construct a tree
-    TreeNode array[][]
-    
-    for (lv = 0; lv = steps + 1; ++lv)
-        // The root is level 0; at level i there are i + 1 nodes
-        // Calculate spot price for nodes from root to bottom
-        vector<> nodes_at_lv
-        if lv == 0:
-            nodes_at_lv = [TreeNode(spot)]
-        else:
-            nodes_at_lv = [] # the list of nodes at level lv
-            for idx in range(lv + 1):
-                if idx == 0:
-                    node = TreeNode(self.tree[lv-1][idx].spot * u)
-                else:
-                    node = TreeNode(self.tree[lv-1][idx-1].spot * d)
-                nodes_at_lv.append(node)
-
-        self.tree.append(nodes_at_lv)
-	
+    return PyModule_Create(&module);
 }
-		
-		
-		
-    def get_option_price(self, type, round_digit=4):
-        self.tree.reverse() # Reverse the tree as we calculate values from bottom to root
-        for i, tree_at_lv in enumerate(self.tree):
-            for j, node in enumerate(tree_at_lv):
-                if i == 0: # bottom level, no next level
-                    node.opt = self.get_opt_4_last_step(node.spot, type)
-                else: # not bottom level, calculate option price from next level
-                    node.opt = self.get_opt_4_prev_step(self.tree[i-1][j].opt, self.tree[i-1][j+1].opt)
-                
-                #print 'spot price =', node.spot, 'option price =', node.opt
-        
-        return round(self.tree[i][j].opt, round_digit)
-        
-    def get_opt_4_last_step(self, spot, type):
-        '''Get option price for the last step:
-        Input the spot price for the last step and return its option price'''
-        if type == OptionType.PUT:
-            if spot >= self.strike:
-                return 0
-            else:
-                return self.strike - spot
-        elif type == OptionType.CALL:
-            if spot <= self.strike:
-                return 0
-            else:
-                return spot - self.strike
-    
-    def get_opt_4_prev_step(self, up_opt, down_opt):
-        '''Get option price for the previous step:
-        Input 2 option prices at step N and return the option price at step N - 1'''        
-        return (self.p * up_opt + (1 - self.p) * down_opt) / self.a
-    
-    
-class TreeNode
+
+#else
+
+PyMODINIT_FUNC init_binomial_trees(void)
 {
-    public:
-    	TreeNode(spot)
-    	{
-        	this->spot = spot
-        	this->opt = 0
-        }
-}
\ No newline at end of file
+    Py_InitModule3("_binomial_trees", methods, "Native binomial trees");
+}
+
+#endif
@@ -1,7 +1,7 @@
 import matplotlib.pyplot as plt
 import numpy as np
 
-from binomial_trees import BinomialTree
+from binomial_trees import BinomialTree, get_prices_for_steps
 from black_scholes import OptionType
 
 from multiprocessing import Process, Queue
@@ -22,7 +22,7 @@ class OptionPricePlot(object):
             resultq.put((idx, prices))
             resultq.close()
 
-    def plot_price_vs_steps(self, start, end, step, ps_num=16):
+    def plot_price_vs_steps(self, start, end, step, ps_num=0):
         ''' ps_num: run in multiprocess mode with ps_num processes
         To run in single process mode, ps_num = 0
         '''
@@ -49,8 +49,8 @@ class OptionPricePlot(object):
                 prices += dict[k]
                 
         else:
-            # Single processing
-            prices = [self.get_price(steps=steps) for steps in steps_list]
+            # Single processing, all steps together
+            prices = get_prices_for_steps(50, 52, 0.05, 2, 0.3, steps_list, OptionType.PUT)
         
         plt.plot(steps_list, prices)
 
@@ -72,10 +72,11 @@ if __name__ == '__main__':
     
     import time
     t0 = time.time()
-    opp.plot_price_vs_steps(6, 300, 1, 4) 
+    opp.plot_price_vs_steps(6, 900, 1, 0) 
     # (6, 900, 3): M5: 90  M10: 77  M20: 65  M30: 77  S: 171
     # (6, 400, 1): S: 42
     # (6, 300, 1): S: 18  M4: 13  M10: 14
+    # with get_prices_for_steps, (6, 900, 1): S: 0.03
     
     print 'time consumed in seconds:', round(time.time() - t0)
 
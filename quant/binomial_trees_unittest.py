@@ -1,7 +1,14 @@
 
 import unittest
-from binomial_trees import BinomialTree
-from black_scholes import OptionType
+from math import exp
+
+import numpy as np
+
+import binomial_trees
+from binomial_trees import (BinomialTree, LeisenReimerTree, TrinomialTree, LATTICES, Extrapolation, 
+                            get_extrapolated_price, get_prices_for_steps, get_lattice_prices)
+from black_scholes import BlackScholes, OptionType, OptionTypeError, get_option_prices
+from black_scholes_greeks import BlackScholesGreeks
 
 
 class BinomialTreeTestCase(unittest.TestCase):
@@ -13,7 +20,204 @@ class BinomialTreeTestCase(unittest.TestCase):
         bt = BinomialTree(50, 52, 0.05, 2, 0.3, steps=100)
         self.assertEqual(6.7781, # steps = 100
                          bt.get_option_price(OptionType.PUT))
-        
+
+    def test_steps(self):
+        '''The same option as test_basic with different steps, 
+        the price converges to the Black-Scholes price 6.7601'''
+        self.assertEqual(6.747,
+                         BinomialTree(50, 52, 0.05, 2, 0.3, steps=10).get_option_price(OptionType.PUT))
+        self.assertEqual(6.7569,
+                         BinomialTree(50, 52, 0.05, 2, 0.3, steps=500).get_option_price(OptionType.PUT))
+        self.assertAlmostEqual(6.7601,
+                               BinomialTree(50, 52, 0.05, 2, 0.3, steps=20000).get_option_price(OptionType.PUT), 3)
+
+
+    def test_reuse(self):
+        '''Price a call, a put and a ladder of strikes on the same lattice'''
+        bt = BinomialTree(50, 52, 0.05, 2, 0.3, steps=100)
+        call = bt.get_option_price(OptionType.CALL)
+        self.assertEqual(6.7781, bt.get_option_price(OptionType.PUT))
+        self.assertEqual(call, bt.get_option_price(OptionType.CALL))
+        self.assertAlmostEqual(call - 6.7781, 50 - 52 * exp(- 0.05 * 2), 3) # put-call parity
+
+        strikes = [40, 45, 52, 60]
+        puts = bt.get_option_prices(OptionType.PUT, strikes)
+        calls = bt.get_option_prices(OptionType.CALL, strikes, 8)
+        for k, put, call in zip(strikes, puts, calls):
+            self.assertEqual(BinomialTree(50, k, 0.05, 2, 0.3, steps=100).get_option_price(OptionType.PUT), put)
+            self.assertEqual(bt.get_option_price(OptionType.CALL, 8, strike=k), call)
+        self.assertEqual(6.7781, puts[2])
+
+
+    def test_prices_for_steps(self):
+        '''The whole convergence curve at once is the same as one tree for each steps'''
+        steps_list = range(1, 60) + [100, 500]
+        prices = get_prices_for_steps(50, 52, 0.05, 2, 0.3, steps_list, OptionType.PUT)
+        for steps, price in zip(steps_list, prices):
+            self.assertAlmostEqual(BinomialTree(50, 52, 0.05, 2, 0.3, steps).get_option_price(OptionType.PUT, 10), 
+                                   price, 10)
+        self.assertEqual(6.7781, round(prices[-2], 4))
+
+    def test_extrapolated_price(self):
+        '''Extrapolation reaches the Black-Scholes price 6.7601 with far fewer steps'''
+        self.assertEqual(6.7601, get_extrapolated_price(50, 52, 0.05, 2, 0.3, OptionType.PUT, 100))
+        self.assertAlmostEqual(6.7601, get_extrapolated_price(50, 52, 0.05, 2, 0.3, OptionType.PUT, 50), 3)
+        self.assertAlmostEqual(6.7601, get_extrapolated_price(50, 52, 0.05, 2, 0.3, OptionType.PUT, 100,
+                                                              Extrapolation.AVERAGE), 2)
+        # Better than a plain tree with 20 times the steps
+        self.assertTrue(abs(get_extrapolated_price(60, 65, 0.08, 0.25, 0.3, OptionType.CALL, 50, round_digit=8) - 2.1334) <
+                        abs(BinomialTree(60, 65, 0.08, 0.25, 0.3, 1000).get_option_price(OptionType.CALL, 8) - 2.1334))
+
+    def test_extrapolated_price_with_coc(self):
+        '''Q: European options, spot price 100, strike price 100, risk free interest rate 8%, expiry 1 year,
+        volatility 30%, cost of carry 4% and 0 (an option on a future)
+        A: the Black-Scholes prices, call 13.214 and put 9.4467 with 4%, 11.0068 both with 0'''
+        for coc, call, put in ((0.04, 13.214, 9.4467), (0, 11.0068, 11.0068)):
+            self.assertAlmostEqual(call, get_extrapolated_price(100, 100, 0.08, 1, 0.3, OptionType.CALL, coc=coc), 2)
+            self.assertAlmostEqual(put, get_extrapolated_price(100, 100, 0.08, 1, 0.3, OptionType.PUT, coc=coc), 2)
+            self.assertAlmostEqual(put, get_extrapolated_price(100, 100, 0.08, 1, 0.3, OptionType.PUT, 100,
+                                                               Extrapolation.AVERAGE, coc=coc), 2)
+            price = get_prices_for_steps(100, 100, 0.08, 1, 0.3, [30], OptionType.CALL, coc)[0]
+            self.assertAlmostEqual(BinomialTree(100, 100, 0.08, 1, 0.3, 30, coc).get_option_price(OptionType.CALL, 10),
+                                   price, 10)
+        self.assertRaises(ValueError, get_extrapolated_price, 50, 52, 0.05, 2, 0.3, OptionType.PUT, 1)
+
+    def test_extrapolated_price_odd_steps(self):
+        '''Richardson extrapolation with odd steps is as accurate as with even steps'''
+        contracts = [(spot, strike, 0.05, expiry, 0.3, otype) for spot in (90, 110) for strike in (95, 105)
+                     for expiry in (0.5, 2) for otype in (OptionType.CALL, OptionType.PUT)]
+        errors = dict((steps, np.mean([abs(get_extrapolated_price(*c, steps=steps, round_digit=10, coc=0.02) -
+                                           get_option_prices(*(c[:5] + (0.02, c[5])))) for c in contracts]))
+                      for steps in (50, 51, 100, 101))
+        self.assertTrue(errors[51] < 1.5 * errors[50] and errors[101] < 1.5 * errors[100])
+        self.assertTrue(errors[51] < 6e-4 and errors[101] < 3e-4)
+        self.assertAlmostEqual(6.7601, get_extrapolated_price(50, 52, 0.05, 2, 0.3, OptionType.PUT, 101), 3)
+
+
+    def test_lattices(self):
+        '''The lattices with cost of carry 2% (dividend yield 3%) converge to the Black-Scholes prices, 
+        Leisen-Reimer with far fewer steps than CRR'''
+        for otype in (OptionType.CALL, OptionType.PUT):
+            bs_price = BlackScholes(None, 50, 52, 0.05, 2, 0.3, cost_of_carry=0.02).get_option_price(otype, 8)
+            lr_price = LeisenReimerTree(50, 52, 0.05, 2, 0.3, steps=101, coc=0.02).get_option_price(otype, 8)
+            self.assertAlmostEqual(bs_price, lr_price, 4)
+            crr_price = BinomialTree(50, 52, 0.05, 2, 0.3, steps=1001, coc=0.02).get_option_price(otype, 8)
+            self.assertTrue(abs(lr_price - bs_price) < abs(crr_price - bs_price) / 10)
+            self.assertAlmostEqual(bs_price, 
+                                   TrinomialTree(50, 52, 0.05, 2, 0.3, steps=1000, coc=0.02).get_option_price(otype), 2)
+
+        # Leisen-Reimer needs odd steps
+        self.assertEqual(101, LeisenReimerTree(50, 52, 0.05, 2, 0.3, steps=100).steps)
+        self.assertEqual(6.7601, LeisenReimerTree(50, 52, 0.05, 2, 0.3, steps=100).get_option_price(OptionType.PUT))
+
+        # Other strikes get a tree centred on them, as accurate as one built for them
+        lr = LeisenReimerTree(50, 52, 0.05, 2, 0.3, steps=101, coc=0.02)
+        strikes = [40, 52, 65]
+        bs_prices = get_option_prices(50, strikes, 0.05, 2, 0.3, 0.02, OptionType.CALL)
+        prices = lr.get_option_prices(OptionType.CALL, strikes, 8)
+        self.assertTrue(np.abs(prices - bs_prices).max() < 1e-4)
+        self.assertEqual(LeisenReimerTree(50, 65, 0.05, 2, 0.3, steps=101, coc=0.02).get_option_price(OptionType.CALL, 8),
+                         lr.get_option_price(OptionType.CALL, 8, strike=65))
+        self.assertEqual(52, lr.strike)
+
+        # The same interface for all the lattices
+        for name, lattice in LATTICES.iteritems():
+            tree = lattice(60, 65, 0.08, 0.25, 0.3, steps=500)
+            self.assertAlmostEqual(2.1334, tree.get_option_price(OptionType.CALL), 2)
+            self.assertEqual(3, len(tree.get_option_prices(OptionType.PUT, [60, 65, 70])))
+        self.assertEqual(7, len(TrinomialTree(60, 65, 0.08, 0.25, 0.3, steps=3).spots))
+
+    def test_american(self):
+        '''Q: Hull's American put, spot price 50, strike price 50, risk free interest rate 10%, 
+        expiry 5 months, volatility 40%, 5 steps
+        A: 4.49, and 4.28 with many steps'''
+        self.assertEqual(4.4885, BinomialTree(50, 50, 0.1, 5 / 12.0, 0.4, 5).get_option_price(OptionType.PUT, american=True))
+        for lattice in LATTICES.itervalues():
+            tree = lattice(50, 50, 0.1, 5 / 12.0, 0.4, 1001)
+            self.assertAlmostEqual(4.284, tree.get_option_price(OptionType.PUT, american=True), 2)
+
+        # An American call without dividends is never exercised early, an American put is worth more
+        tree = BinomialTree(50, 52, 0.05, 2, 0.3, steps=100)
+        self.assertEqual(tree.get_option_price(OptionType.CALL), tree.get_option_price(OptionType.CALL, american=True))
+        self.assertTrue(tree.get_option_price(OptionType.PUT, american=True) > tree.get_option_price(OptionType.PUT) + 0.3)
+        # ... but it is with dividends
+        tree = BinomialTree(50, 52, 0.05, 2, 0.3, steps=100, coc=-0.05)
+        self.assertTrue(tree.get_option_price(OptionType.CALL, american=True) > tree.get_option_price(OptionType.CALL))
+
+    def test_greeks(self):
+        '''The Greeks of European options from the lattices agree with the Black-Scholes Greeks'''
+        for otype in (OptionType.CALL, OptionType.PUT):
+            bs = BlackScholesGreeks(None, 50, 52, 0.05, 2, 0.3, cost_of_carry=0.02).get_greeks(otype)
+            for lattice in LATTICES.itervalues():
+                greeks = lattice(50, 52, 0.05, 2, 0.3, steps=201, coc=0.02).get_greeks(otype)
+                self.assertEqual(['delta', 'gamma', 'price', 'theta'], sorted(greeks))
+                self.assertAlmostEqual(bs['price'], greeks['price'], 2)
+                self.assertAlmostEqual(bs['delta'], greeks['delta'], 3)
+                self.assertAlmostEqual(bs['gamma'], greeks['gamma'], 3)
+                self.assertAlmostEqual(bs['theta'], greeks['theta'], 1)
+
+        # American put: the price as get_option_price, a steeper delta than the European one
+        tree = BinomialTree(50, 52, 0.05, 2, 0.3, steps=100)
+        greeks = tree.get_greeks(OptionType.PUT, american=True)
+        self.assertEqual(tree.get_option_price(OptionType.PUT, american=True), greeks['price'])
+        self.assertTrue(greeks['delta'] < tree.get_greeks(OptionType.PUT)['delta'] < 0)
+        self.assertTrue(greeks['gamma'] > 0)
+
+    def test_lattice_prices(self):
+        '''A batch of contracts priced together are the same as priced by a BinomialTree each'''
+        rs = np.random.RandomState(1)
+        num = 50
+        spots, strikes = rs.uniform(80, 120, num), rs.uniform(80, 120, num)
+        expiries, vols = rs.uniform(0.1, 2, num), rs.uniform(0.1, 0.5, num)
+        otypes = rs.randint(2, size=num)
+        for american in (False, True):
+            prices = get_lattice_prices(spots, strikes, 0.05, expiries, vols, 0.02, otypes, 50, american, 8)
+            expected = [BinomialTree(spots[i], strikes[i], 0.05, expiries[i], vols[i], 50, coc=0.02)
+                        .get_option_price(otypes[i], 8, american=american) for i in xrange(num)]
+            self.assertEqual(expected, list(prices))
+
+        # Broadcast against each other
+        prices = get_lattice_prices(50, [[48], [52]], 0.05, 2, 0.3, 0.05, [OptionType.CALL, OptionType.PUT], 100)
+        self.assertEqual((2, 2), prices.shape)
+        self.assertAlmostEqual(6.7781, prices[1, 1], 4)
+        self.assertAlmostEqual(4.4885, get_lattice_prices(50, 50, 0.1, 5 / 12.0, 0.4, 0.1, OptionType.PUT, 5, True), 4)
+        self.assertRaises(OptionTypeError, get_lattice_prices, 50, 52, 0.05, 2, 0.3, 0.05, 2)
+
+
+@unittest.skipIf(binomial_trees._binomial_trees is None, 'the native trees are not built, run setup.py build_ext')
+class NativeLatticeTestCase(unittest.TestCase):
+
+    def test_parity(self):
+        '''The native trees give the same prices as the numpy sweep, European and American'''
+        rs = np.random.RandomState(2)
+        num = 200
+        args = (rs.uniform(80, 120, num), rs.uniform(80, 120, num), rs.uniform(0, 0.1, num), 
+                rs.uniform(0.1, 2, num), rs.uniform(0.1, 0.5, num), rs.uniform(-0.05, 0.1, num), 
+                rs.randint(2, size=num))
+        for american in (False, True):
+            np.testing.assert_allclose(get_lattice_prices(*args, steps=101, american=american, native=False),
+                                       get_lattice_prices(*args, steps=101, american=american), 
+                                       rtol=1e-12, atol=1e-12)
+
+    def test_basic(self):
+        '''The same prices as BinomialTreeTestCase'''
+        self.assertEqual(6.7781, get_lattice_prices(50, 52, 0.05, 2, 0.3, 0.05, OptionType.PUT, 100, round_digit=4))
+        self.assertEqual(4.4885, get_lattice_prices(50, 50, 0.1, 5 / 12.0, 0.4, 0.1, OptionType.PUT, 5, True, 4))
+        prices = get_lattice_prices(50, [[48], [52]], 0.05, 2, 0.3, 0.05, [OptionType.CALL, OptionType.PUT], 100)
+        self.assertEqual((2, 2), prices.shape)
+
+    def test_buffers(self):
+        '''Only contiguous buffers of doubles with one element for each contract'''
+        args = [np.array([v], dtype=float) for v in (50, 52, 0.05, 2, 0.3, 0.05, -1)]
+        out = np.empty(1)
+        binomial_trees._binomial_trees.price_lattices(*args + [100, False, out])
+        self.assertAlmostEqual(6.7781, out[0], 4)
+        self.assertRaises(ValueError, binomial_trees._binomial_trees.price_lattices, 
+                          *args[:-1] + [np.array([-1], dtype=np.float32), 100, False, out])
+        self.assertRaises(ValueError, binomial_trees._binomial_trees.price_lattices, 
+                          *args + [100, False, np.empty(2)])
+        self.assertRaises(ValueError, binomial_trees._binomial_trees.price_lattices, *args + [0, False, out])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
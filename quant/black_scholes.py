@@ -95,7 +95,10 @@
 
 from math import exp, log, sqrt
 #from scipy.stats import norm  # much slower than cdf
-from option import Option, OptionType, OptionTypeError, cdf
+
+import numpy as np
+
+from option import Option, OptionType, OptionTypeError, cdf, cdf_array, round_array
 
 class BlackScholes(Option):
 
@@ -139,3 +142,37 @@ class BlackScholes(Option):
             raise OptionTypeError
         
         return round(price, round_digit)
+
+
+def get_option_prices(spot, strike, rate, expiry, vol, cost_of_carry, otype, round_digit=None):
+    '''Price a whole batch of options with the generalized Black-Scholes formula.
+
+    Every argument can be a scalar or an array, they are broadcast against each other.
+    otype is OptionType.CALL, OptionType.PUT or an array of them.
+    The prices are returned as an array; if round_digit is given every price is rounded
+    the same way as BlackScholes.get_option_price does.
+
+    Calls and puts are priced by the same expression thanks to put-call supersymmetry:
+        price = z * (S * exp((b - r) * T) * N(z * d1) - X * exp(-rT) * N(z * d2))
+    where z is 1 for a call and -1 for a put.
+    '''
+    spot, strike, rate, expiry, vol, cost_of_carry = [np.asarray(v, dtype=float) for v in
+                                                      (spot, strike, rate, expiry, vol, cost_of_carry)]
+    otype = np.asarray(otype)
+    is_put = otype == OptionType.PUT
+    if not (is_put | (otype == OptionType.CALL)).all():
+        raise OptionTypeError
+    z = np.where(is_put, -1.0, 1.0)
+
+    vol_sqrt_t = vol * np.sqrt(expiry)
+    d1 = (np.log(spot / strike) + (cost_of_carry + vol ** 2 / 2) * expiry) / vol_sqrt_t
+    d2 = d1 - vol_sqrt_t
+
+    price = spot * np.exp((cost_of_carry - rate) * expiry) * cdf_array(z * d1)
+    price -= strike * np.exp(- rate * expiry) * cdf_array(z * d2)
+    price *= z
+
+    if round_digit is not None:
+        price = round_array(price, round_digit)
+
+    return price
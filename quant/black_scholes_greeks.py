@@ -7,21 +7,108 @@ Delta: changes in the underlying asset price
     where 
         b: is cost of carry
         r: risk free interest rate
+
+Gamma: changes in delta when the underlying asset price changes
+
+    gamma_call = gamma_put = exp((b - r) * T) * n(d1) / (S * vol * sqrt(T))
+
+    where
+        n(x): the standard normal density function
+
+Vega: changes in the volatility
+
+    vega_call = vega_put = S * exp((b - r) * T) * n(d1) * sqrt(T)
+
+Theta: time decay, i.e. changes in the option price when time to expiry decreases (per year)
+
+    theta_call = - S * exp((b - r) * T) * n(d1) * vol / (2 * sqrt(T))
+                 - (b - r) * S * exp((b - r) * T) * N(d1) - r * X * exp(-rT) * N(d2)
+    theta_put  = - S * exp((b - r) * T) * n(d1) * vol / (2 * sqrt(T))
+                 + (b - r) * S * exp((b - r) * T) * N(-d1) + r * X * exp(-rT) * N(-d2)
+
+Rho: changes in the risk free interest rate, with the cost of carry unchanged
+
+    rho_call = - T * c
+    rho_put  = - T * p
+
+Carry: changes in the cost of carry rate
+
+    carry_call =   T * S * exp((b - r) * T) * N(d1)
+    carry_put  = - T * S * exp((b - r) * T) * N(-d1)
+
+    Note:
+        for a stock option b == r, so the rate moves the cost of carry as well and the total 
+        sensitivity to r is rho + carry, i.e. T * X * exp(-rT) * N(d2) for a call
 '''
 
+from math import exp, pi, sqrt
+
+import numpy as np
+
 from black_scholes import BlackScholes
-from option import OptionType, OptionTypeError, cdf
-from math import exp
+from option import OptionType, OptionTypeError, cdf, cdf_array
+
+GREEKS = ('price', 'delta', 'gamma', 'vega', 'theta', 'rho', 'carry')
+
 
 class BlackScholesGreeks(BlackScholes):
     
     def get_delta_greeks(self, otype, round_digit=4):
+        d1 = self.get_d1_d2()[0]
         if otype == OptionType.CALL:
-            delta = exp((self.cost_of_carry - self.rate) * self.expiry) * cdf(self.get_d1_d2()[0])
+            delta = exp((self.cost_of_carry - self.rate) * self.expiry) * cdf(d1)
         elif otype == OptionType.PUT:
-            delta = exp((self.cost_of_carry - self.rate) * self.expiry) * (cdf(self.get_d1_d2()[0]) - 1)
+            delta = exp((self.cost_of_carry - self.rate) * self.expiry) * (cdf(d1) - 1)
         else:
             raise OptionTypeError
 
         return round(delta, round_digit)
 
+    def get_greeks(self, otype, round_digit=4):
+        '''Return a dict of the price and all the Greeks in GREEKS, calculated in a single pass'''
+        greeks = get_greeks(self.spot, self.strike, self.rate, self.expiry, self.vol, self.cost_of_carry, otype)
+
+        return dict((k, round(float(v), round_digit)) for k, v in greeks.iteritems())
+
+
+def get_greeks(spot, strike, rate, expiry, vol, cost_of_carry, otype):
+    '''Calculate the price and all the Greeks in GREEKS for one contract or a batch of contracts.
+
+    Every argument can be a scalar or an array, they are broadcast against each other.
+    A dict of arrays keyed by GREEKS is returned.
+
+    log-moneyness, sqrt(T), the discount factors, N(d1), N(d2) and n(d1) are calculated only once
+    and shared by all the outputs. As in black_scholes.get_option_prices, calls and puts use the same
+    expressions with z = 1 for a call and z = -1 for a put.
+    '''
+    spot, strike, rate, expiry, vol, cost_of_carry = [np.asarray(v, dtype=float) for v in
+                                                      (spot, strike, rate, expiry, vol, cost_of_carry)]
+    otype = np.asarray(otype)
+    is_put = otype == OptionType.PUT
+    if not (is_put | (otype == OptionType.CALL)).all():
+        raise OptionTypeError
+    z = np.where(is_put, -1.0, 1.0)
+
+    sqrt_t = np.sqrt(expiry)
+    vol_sqrt_t = vol * sqrt_t
+    d1 = (np.log(spot / strike) + (cost_of_carry + vol ** 2 / 2) * expiry) / vol_sqrt_t
+    d2 = d1 - vol_sqrt_t
+
+    carry_df = np.exp((cost_of_carry - rate) * expiry)
+    fwd_term = spot * carry_df                  # S * exp((b - r) * T)
+    strike_term = strike * np.exp(- rate * expiry) # X * exp(-rT)
+    n_d1 = z * cdf_array(z * d1)                # N(d1) for a call, -N(-d1) for a put
+    n_d2 = z * cdf_array(z * d2)                # N(d2) for a call, -N(-d2) for a put
+    pdf_d1 = np.exp(- d1 ** 2 / 2) / sqrt(2 * pi)
+
+    price = fwd_term * n_d1 - strike_term * n_d2
+    fwd_pdf = fwd_term * pdf_d1
+
+    return {'price': price,
+            'delta': carry_df * n_d1,
+            'gamma': fwd_pdf / (spot * spot * vol_sqrt_t),
+            'vega':  fwd_pdf * sqrt_t,
+            'theta': - fwd_pdf * vol / (2 * sqrt_t) - (cost_of_carry - rate) * fwd_term * n_d1 - rate * strike_term * n_d2,
+            'rho':   - expiry * price,
+            'carry': expiry * fwd_term * n_d1,
+           }
@@ -1,8 +1,11 @@
 
 from unittest import TestCase, main
-from black_scholes import BlackScholes
-from option import OptionType
-from black_scholes_greeks import BlackScholesGreeks
+
+import numpy as np
+
+from black_scholes import BlackScholes, get_option_prices
+from option import OptionType, OptionTypeError
+from black_scholes_greeks import BlackScholesGreeks, GREEKS, get_greeks
 
 class BlackScholesModelTestCase(TestCase):
 
@@ -81,6 +84,42 @@ class BlackScholesModelTestCase(TestCase):
                          bsm.get_option_price(OptionType.PUT))
 
 
+class BlackScholesBatchTestCase(TestCase):
+
+    def test_same_as_scalar(self):
+        '''Price all the contracts above in one batch, calls and puts mixed'''
+        spots = np.array([60, 100, 19, 19, 1.56, 1 / 1.56, 50])
+        strikes = np.array([65, 95, 19, 19, 1.6, 1 / 1.6, 52])
+        rates = np.array([0.08, 0.1, 0.1, 0.1, 0.06, 0.08, 0.05])
+        expiries = np.array([0.25, 0.5, 0.75, 0.75, 0.5, 0.5, 2])
+        vols = np.array([0.3, 0.2, 0.28, 0.28, 0.12, 0.12, 0.3])
+        cocs = np.array([0.08, 0.05, 0, 0, -0.02, 0.02, 0.05])
+        otypes = np.array([OptionType.CALL, OptionType.PUT, OptionType.CALL, OptionType.PUT,
+                           OptionType.CALL, OptionType.PUT, OptionType.PUT])
+
+        prices = get_option_prices(spots, strikes, rates, expiries, vols, cocs, otypes, round_digit=4)
+        self.assertEqual([2.1334, 2.4648, 1.7011, 1.7011, 0.0291, 0.0117, 6.7601], list(prices))
+
+        prices = get_option_prices(spots, strikes, rates, expiries, vols, cocs, otypes)
+        for i, price in enumerate(prices):
+            bsm = BlackScholes(None, spots[i], strikes[i], rates[i], expiries[i], vols[i], cost_of_carry=cocs[i])
+            self.assertAlmostEqual(bsm.get_option_price(otypes[i], 12), price, 12)
+
+    def test_option_chain(self):
+        '''A chain of strikes on one underlying, scalars are broadcast'''
+        strikes = np.arange(40, 81, 5)
+        calls = get_option_prices(60, strikes, 0.08, 0.25, 0.3, 0.08, OptionType.CALL, 4)
+        puts = get_option_prices(60, strikes, 0.08, 0.25, 0.3, 0.08, OptionType.PUT, 4)
+        self.assertEqual(2.1334, calls[5])
+        for k, c, p in zip(strikes, calls, puts):
+            self.assertEqual(BlackScholes('stock_option', 60, k, 0.08, 0.25, 0.3).get_option_price(OptionType.PUT), p)
+            # put-call parity
+            self.assertAlmostEqual(c - p, 60 - k * np.exp(- 0.08 * 0.25), 3)
+
+    def test_unknown_option_type(self):
+        self.assertRaises(OptionTypeError, get_option_prices, 60, 65, 0.08, 0.25, 0.3, 0.08, [0, 2])
+
+
 class BlackScholesGreeksTestCase(TestCase):
     def test_delta_greeks(self):
         ''' 
@@ -122,6 +161,67 @@ class BlackScholesGreeksTestCase(TestCase):
                                3)
         self.assertEqual(round(opt_price - 1.1273, 4),
                          BlackScholes(None, 89, 40, 0.03, 2, 0.2, cost_of_carry=0.09).get_option_price(OptionType.CALL))
+
+    def test_all_greeks(self):
+        '''
+        Q:
+            A call option, 9 month to expiry, the stock price is 55, the strike price is 60,
+            the risk-free interest rate is 10% per year and so is the cost-of-carry,
+            the volatility is 30% per year
+        A:
+            gamma = 0.0278, vega = 18.9358
+        Q:
+            A put option on a stock index, 1 month to expiry, the index is 430, the strike
+            price is 405, the risk-free interest rate is 7% per year, the dividend yield is 5% 
+            per year, the volatility is 20% per year
+        A:
+            theta_put = -31.1924
+        Q:
+            A call option, 1 year to expiry, the stock price is 72, the strike price is 75,
+            the risk-free interest rate is 9% per year, the volatility is 19% per year
+        A:
+            rho_call = 38.7325 (the cost of carry moves with the rate for a stock option)
+        '''
+        greeks = BlackScholesGreeks(None, 55, 60, 0.1, 0.75, 0.3, cost_of_carry=0.1).get_greeks(OptionType.CALL)
+        self.assertEqual(0.0278, greeks['gamma'])
+        self.assertEqual(18.9358, greeks['vega'])
+
+        greeks = BlackScholesGreeks(None, 430, 405, 0.07, 0.0833, 0.2, cost_of_carry=0.02).get_greeks(OptionType.PUT)
+        self.assertEqual(-31.1924, greeks['theta'])
+
+        greeks = BlackScholesGreeks('stock_option', 72, 75, 0.09, 1, 0.19).get_greeks(OptionType.CALL, 6)
+        self.assertAlmostEqual(38.7325, greeks['rho'] + greeks['carry'], 4)
+
+        bsg = BlackScholesGreeks('futures_option', 105, 100, 0.1, 0.5, 0.36)
+        for otype in (OptionType.CALL, OptionType.PUT):
+            greeks = bsg.get_greeks(otype)
+            self.assertEqual(sorted(GREEKS), sorted(greeks))
+            self.assertEqual(bsg.get_option_price(otype), greeks['price'])
+            self.assertEqual(bsg.get_delta_greeks(otype), greeks['delta'])
+
+    def test_greeks_against_bumps(self):
+        '''Compare a batch of Greeks with central differences of the Black-Scholes price'''
+        spots = np.array([90, 100, 110, 100])
+        otypes = np.array([OptionType.CALL, OptionType.PUT, OptionType.PUT, OptionType.CALL])
+        greeks = get_greeks(spots, 100, 0.03, 2, 0.2, 0.09, otypes)
+
+        def price(spot, rate=0.03, expiry=2, vol=0.2, coc=0.09):
+            return [BlackScholes(None, s, 100, rate, expiry, vol, cost_of_carry=coc).get_option_price(t, 12)
+                    for s, t in zip(spot, otypes)]
+
+        h = 1e-4
+        bumps = {'delta': (price(spots + h), price(spots - h)),
+                 'vega':  (price(spots, vol=0.2 + h), price(spots, vol=0.2 - h)),
+                 'theta': (price(spots, expiry=2 - h), price(spots, expiry=2 + h)),
+                 'rho':   (price(spots, rate=0.03 + h), price(spots, rate=0.03 - h)),
+                 'carry': (price(spots, coc=0.09 + h), price(spots, coc=0.09 - h)),
+                }
+        for greek, (up, down) in bumps.iteritems():
+            np.testing.assert_allclose(greeks[greek], (np.array(up) - down) / (2 * h), rtol=1e-5)
+
+        gamma = (np.array(price(spots + 0.01)) - 2 * np.array(price(spots)) + price(spots - 0.01)) / 0.01 ** 2
+        np.testing.assert_allclose(greeks['gamma'], gamma, rtol=1e-4)
+        np.testing.assert_allclose(greeks['price'], price(spots), rtol=1e-12)
         
 
 
@@ -0,0 +1,186 @@
+'''
+Pricing engines: every model can be priced by several backends, and the fastest one available is used.
+
+Models:
+    Model.FORMULA:    the generalized Black-Scholes formula
+    Model.LATTICE:    CRR binomial trees, params: steps, american
+    Model.SIMULATION: Monte Carlo simulation, params: simu_num, seed
+    Model.BARRIER:    the closed form of standard barrier options, params: bar, rebate, bar_type
+    Model.PDE:        Crank-Nicolson finite differences, params: space_steps, time_steps, american, bar, rebate,
+                      bar_type
+
+Backends:
+    Backend.PYTHON: pure Python, one contract at a time
+    Backend.NUMPY:  vectorized with numpy
+    Backend.NATIVE: the C++ extensions built by setup.py
+
+A backend is a function
+
+    price(spot, strike, rate, expiry, vol, coc, otype, **params)
+
+registered for a model by register, with a function telling whether it can run on this host, e.g. whether
+its extension is built. get_price picks the first backend available in order of preference, so callers
+don't change when a host has more or fewer backends.
+
+Every backend of a model is checked against its reference, the simplest backend registered for the model
+(the last one in PREFERENCE), by check_parity on the fixed set of contracts PARITY_CONTRACTS.
+'''
+
+from black_scholes import BlackScholes, get_option_prices
+from binomial_trees import BinomialTree, get_lattice_prices
+from barrier_options import BarrierOption, BarrierType, get_barrier_prices
+from finite_difference import FiniteDifference
+from option import OptionType
+import binomial_trees
+import monte_carlo
+
+
+class Model(object):
+    FORMULA = 'formula'
+    LATTICE = 'bitree'
+    SIMULATION = 'simulation'
+    BARRIER = 'barrier'
+    PDE = 'pde'
+
+
+class Backend(object):
+    PYTHON = 'python'
+    NUMPY = 'numpy'
+    NATIVE = 'native'
+
+
+PREFERENCE = (Backend.NATIVE, Backend.NUMPY, Backend.PYTHON) # the fastest first
+
+_engines = {} # model: {backend: (price, is_available)}
+
+
+def register(model, backend, price, is_available=lambda: True):
+    '''Register the function price as the backend of model; is_available tells whether it can run'''
+    _engines.setdefault(model, {})[backend] = (price, is_available)
+
+
+def get_backends(model, preference=PREFERENCE):
+    '''Return the backends of model available on this host, in order of preference'''
+    engines = _engines.get(model, {})
+    return [backend for backend in preference if backend in engines and engines[backend][1]()]
+
+
+def get_engine(model, backend=None, preference=PREFERENCE):
+    '''Return the pricing function of backend, or of the first backend of model available in order of preference'''
+    if backend is None:
+        backends = get_backends(model, preference)
+        if not backends:
+            raise ValueError('No backend available for model {}'.format(model))
+        backend = backends[0]
+    elif backend not in get_backends(model, (backend,)):
+        raise ValueError('Backend {} is not available for model {}'.format(backend, model))
+
+    return _engines[model][backend][0]
+
+
+def get_price(model, spot, strike, rate, expiry, vol, coc, otype, backend=None, preference=PREFERENCE,
+              round_digit=4, **params):
+    '''Price an option by model with backend, or with the first backend available in order of preference'''
+    price = get_engine(model, backend, preference)(spot, strike, rate, expiry, vol, coc, otype, **params)
+    return round(price, round_digit)
+
+
+# The same contracts as the unit tests: (spot, strike, rate, expiry, vol, coc, otype)
+PARITY_CONTRACTS = ((50, 52, 0.05, 2, 0.3, 0.05, OptionType.PUT),
+                    (60, 65, 0.08, 0.25, 0.3, 0.08, OptionType.CALL),
+                    (100, 90, 0.08, 0.5, 0.25, 0.04, OptionType.CALL),
+                    (100, 110, 0.08, 0.5, 0.25, 0.04, OptionType.PUT),
+                   )
+
+# model: (params, the greatest difference allowed from the reference)
+PARITY_PARAMS = {Model.FORMULA: ({}, 1e-8),
+                 Model.LATTICE: ({'steps': 200, 'american': True}, 1e-8),
+                 Model.SIMULATION: ({'simu_num': 50000, 'seed': 1}, 0.25), # about 5 standard errors
+                 Model.BARRIER: ({'bar': 95, 'rebate': 3, 'bar_type': BarrierType.OUT}, 1e-4),
+                }
+
+
+def check_parity(models=None, contracts=PARITY_CONTRACTS):
+    '''Price contracts by every backend available of models (all the models by default) and compare
+    the prices with those of the reference backend.
+    Return a list of (model, backend, contract, price, reference price) which differ by more than
+    allowed in PARITY_PARAMS; an empty list means all the backends agree.
+    '''
+    failures = []
+    for model in (sorted(_engines) if models is None else models):
+        params, tol = PARITY_PARAMS.get(model, ({}, 1e-8))
+        backends = get_backends(model)
+        reference = get_engine(model, backends[-1])
+        for contract in contracts:
+            expected = reference(*contract, **params)
+            for backend in backends[:-1]:
+                price = get_engine(model, backend)(*contract, **params)
+                if not abs(price - expected) <= tol:
+                    failures.append((model, backend, contract, price, expected))
+
+    return failures
+
+
+def _formula_python(spot, strike, rate, expiry, vol, coc, otype):
+    return BlackScholes(None, spot, strike, rate, expiry, vol, cost_of_carry=coc).get_option_price(otype, 12)
+
+
+def _formula_numpy(spot, strike, rate, expiry, vol, coc, otype):
+    return float(get_option_prices(spot, strike, rate, expiry, vol, coc, otype))
+
+
+def _lattice_numpy(spot, strike, rate, expiry, vol, coc, otype, steps=100, american=False):
+    return BinomialTree(spot, strike, rate, expiry, vol, steps, coc).get_option_price(otype, 12, american=american)
+
+
+def _lattice_native(spot, strike, rate, expiry, vol, coc, otype, steps=100, american=False):
+    return float(get_lattice_prices(spot, strike, rate, expiry, vol, coc, otype, steps, american))
+
+
+def _simulation_python(spot, strike, rate, expiry, vol, coc, otype, simu_num=100000, seed=None):
+    return monte_carlo.MonteCarlo(spot, strike, rate, expiry, vol, coc).run(otype, simu_num, 0, native=False, seed=seed)
+
+
+def _simulation_numpy(spot, strike, rate, expiry, vol, coc, otype, simu_num=100000, seed=None):
+    return monte_carlo.MonteCarlo(spot, strike, rate, expiry, vol, coc).simulate(otype, simu_num, seed=seed).get_price()
+
+
+def _simulation_native(spot, strike, rate, expiry, vol, coc, otype, simu_num=100000, seed=None):
+    mc = monte_carlo.MonteCarlo(spot, strike, rate, expiry, vol, coc)
+    return mc.simulate_native(otype, simu_num, seed=seed).get_price()
+
+
+def _barrier_python(spot, strike, rate, expiry, vol, coc, otype, bar=None, rebate=0, bar_type=BarrierType.OUT):
+    return BarrierOption(spot, strike, rate, expiry, vol, coc, rebate, bar).get_payoff(otype, bar_type)
+
+
+def _barrier_numpy(spot, strike, rate, expiry, vol, coc, otype, bar=None, rebate=0, bar_type=BarrierType.OUT):
+    return float(get_barrier_prices(spot, strike, rate, expiry, vol, coc, rebate, bar, otype, bar_type))
+
+
+def _pde_python(spot, strike, rate, expiry, vol, coc, otype, space_steps=200, time_steps=100, american=False,
+                bar=None, rebate=0, bar_type=BarrierType.OUT):
+    fd = FiniteDifference(spot, strike, rate, expiry, vol, coc, space_steps, time_steps)
+    return fd.get_option_price(otype, 12, american, bar, rebate, bar_type)
+
+
+register(Model.FORMULA, Backend.PYTHON, _formula_python)
+register(Model.FORMULA, Backend.NUMPY, _formula_numpy)
+register(Model.LATTICE, Backend.NUMPY, _lattice_numpy)
+register(Model.LATTICE, Backend.NATIVE, _lattice_native, lambda: binomial_trees._binomial_trees is not None)
+register(Model.SIMULATION, Backend.PYTHON, _simulation_python)
+register(Model.SIMULATION, Backend.NUMPY, _simulation_numpy)
+register(Model.SIMULATION, Backend.NATIVE, _simulation_native, lambda: monte_carlo._monte_carlo is not None)
+register(Model.BARRIER, Backend.PYTHON, _barrier_python)
+register(Model.BARRIER, Backend.NUMPY, _barrier_numpy)
+register(Model.PDE, Backend.PYTHON, _pde_python)
+
+
+if __name__ == '__main__':
+    for model in sorted(_engines):
+        print model, get_backends(model)
+    failures = check_parity()
+    for failure in failures:
+        print 'Parity check failed: {} {} {} {} != {}'.format(*failure)
+    if not failures:
+        print 'All the backends agree with their references'
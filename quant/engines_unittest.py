@@ -0,0 +1,66 @@
+from unittest import TestCase, main
+
+from engines import (Model, Backend, PREFERENCE, register, get_backends, get_engine, get_price, check_parity,
+                     _engines)
+from barrier_options import BarrierType
+from option import OptionType
+
+
+class EnginesTestCase(TestCase):
+
+    def tearDown(self):
+        _engines.pop('test', None)
+
+    def test_get_price(self):
+        '''Q: European put option, spot price 50, strike price 52, risk free interest rate 5%
+        expiry 2 years, volatility 30%
+        A: 6.7601 whatever the backend'''
+        args = (50, 52, 0.05, 2, 0.3, 0.05, OptionType.PUT)
+        for backend in get_backends(Model.FORMULA):
+            self.assertEqual(6.7601, get_price(Model.FORMULA, *args, backend=backend))
+        self.assertEqual(6.7781, get_price(Model.LATTICE, *args, steps=100))
+        self.assertTrue(abs(get_price(Model.SIMULATION, *args, simu_num=100000) - 6.7601) < 0.1)
+        self.assertEqual(2.2798, get_price(Model.BARRIER, 100, 90, 0.08, 0.5, 0.25, 0.04, OptionType.PUT, 
+                                           bar=95, rebate=3, bar_type=BarrierType.OUT))
+        self.assertTrue(abs(get_price(Model.PDE, *args) - 6.7601) < 0.005)
+
+    def test_preference(self):
+        '''The first backend available in order of preference is used'''
+        register('test', Backend.PYTHON, lambda *args: 1.0)
+        register('test', Backend.NUMPY, lambda *args: 2.0)
+        register('test', Backend.NATIVE, lambda *args: 3.0, lambda: False) # not built
+        self.assertEqual([Backend.NUMPY, Backend.PYTHON], get_backends('test'))
+        self.assertEqual(2.0, get_price('test', 50, 52, 0.05, 2, 0.3, 0.05, OptionType.PUT))
+        self.assertEqual(1.0, get_price('test', 50, 52, 0.05, 2, 0.3, 0.05, OptionType.PUT, 
+                                        preference=(Backend.PYTHON, Backend.NUMPY)))
+        self.assertEqual(1.0, get_engine('test', Backend.PYTHON)())
+        self.assertRaises(ValueError, get_engine, 'test', Backend.NATIVE)
+        self.assertRaises(ValueError, get_engine, 'test', preference=(Backend.NATIVE,))
+        self.assertRaises(ValueError, get_engine, 'unknown model')
+        for model in (Model.FORMULA, Model.LATTICE, Model.SIMULATION, Model.BARRIER, Model.PDE):
+            self.assertTrue(get_backends(model))
+            self.assertEqual(get_backends(model), [b for b in PREFERENCE if b in get_backends(model)])
+
+    def test_parity(self):
+        '''All the backends agree with their references, and a wrong backend is caught'''
+        self.assertEqual([], check_parity())
+
+        register('test', Backend.PYTHON, lambda spot, strike, *args: spot - strike)
+        register('test', Backend.NUMPY, lambda spot, strike, *args: strike - spot)
+        failures = check_parity(['test'])
+        self.assertEqual(4, len(failures))
+        self.assertEqual(('test', Backend.NUMPY), failures[0][:2])
+
+    def test_simulation_seed(self):
+        '''The simulation backends repeat their prices with a seed, and the python backend takes the same 
+        random numbers as one chunk of the numpy backend'''
+        args = (50, 52, 0.05, 2, 0.3, 0.05, OptionType.PUT)
+        for backend in get_backends(Model.SIMULATION):
+            self.assertEqual(get_price(Model.SIMULATION, *args, backend=backend, simu_num=20000, seed=3),
+                             get_price(Model.SIMULATION, *args, backend=backend, simu_num=20000, seed=3))
+        self.assertAlmostEqual(get_price(Model.SIMULATION, *args, backend=Backend.NUMPY, simu_num=20000, seed=3),
+                               get_price(Model.SIMULATION, *args, backend=Backend.PYTHON, simu_num=20000, seed=3), 3)
+
+
+if __name__ == '__main__':
+    main()
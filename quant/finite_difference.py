@@ -0,0 +1,285 @@
+'''
+Finite differences - the Crank-Nicolson scheme for the generalized Black-Scholes PDE
+
+In log spot price x = log(S) and time to expiry tau, the value V of an option solves
+
+    dV/dtau = vol**2 / 2 * d2V/dx2 + (b - vol**2 / 2) * dV/dx - r * V
+
+with the payoff at tau = 0. On a uniform grid of x with step dx, the right hand side is the tridiagonal operator
+
+    (L V)i = (a - m) * V(i-1) - (2 * a + r) * Vi + (a + m) * V(i+1),    a = vol**2 / (2 * dx**2),  m = (b - vol**2 / 2) / (2 * dx)
+
+and a step of dt from V to V' is the theta scheme
+
+    (I - theta * dt * L) V' = (I + (1 - theta) * dt * L) V
+
+theta = 1/2 is Crank-Nicolson, second order in dt and dx. The kink of the payoff at the strike makes it
+oscillate around the strike though, so the first time steps are each replaced by two fully implicit
+(theta = 1) half steps, which damp the oscillations: the Rannacher start-up.
+
+Each step solves a tridiagonal system by cyclic reduction, O(n) operations done as numpy operations on whole
+levels rather than a loop over the rows. Its coefficients are the same for all the steps of the same size, so
+the system is reduced once and only the right hand side is reduced and substituted back at each step.
+
+Boundaries:
+    far from the spot, the discounted payoff of the forward: exp(-r * tau) * max(z * (S * exp(b * tau) - X), 0)
+    at a barrier H, the grid ends at log(H) and the knock-out option is worth the rebate there (paid at hit).
+    A knock-in option is the vanilla one less a knock-out one, see FiniteDifference.solve.
+
+American options (the penalty method of Forsyth and Vetzal):
+    each step solves (A + P) V' = rhs + P * g, where g is the intrinsic value and P is a large number on the
+    nodes where V' < g and 0 elsewhere, starting from the nodes of the previous step and iterating until they
+    don't change - usually one or two iterations.
+
+One solve gives the option values at all the nodes, i.e. for a whole ladder of spot prices, from which delta
+and gamma follow:
+
+    delta = dV/dx / S,  gamma = (d2V/dx2 - dV/dx) / S**2
+
+Prices between the nodes are interpolated by the parabola through the three nearest nodes, see PDEGrid.
+'''
+
+from math import exp, log, sqrt
+
+import numpy as np
+
+from barrier_options import BarrierType, BarrierTypeError
+from black_scholes import get_option_prices
+from option import Option, OptionType, OptionTypeError
+
+
+PENALTY = 1e8 # the penalty of the nodes below the intrinsic value of an American option
+
+
+class _Tridiagonal(object):
+    '''The cyclic reduction of a tridiagonal matrix: lower[i] = A[i][i-1], diag[i] = A[i][i], upper[i] = A[i][i+1].
+
+    The system is padded to 2**k - 1 equations with x = 0. Each level eliminates the even unknowns from the odd
+    equations, which couple the odd unknowns only, by the multipliers
+
+        alpha_i = - lower_i / diag_(i-1),  gamma_i = - upper_i / diag_(i+1)
+
+    until one equation is left. The multipliers of all the levels are kept, so solving for another right hand
+    side is a few numpy operations per level, about 2 * log2(n) in all, without a loop over the rows.
+    '''
+
+    def __init__(self, lower, diag, upper):
+        self.n = len(diag)
+        size = 2 ** int(np.ceil(np.log2(self.n + 1))) - 1
+        a, b, c = np.zeros(size), np.ones(size), np.zeros(size)
+        a[1:self.n] = lower[1:]
+        b[:self.n] = diag
+        c[:self.n - 1] = upper[:-1]
+
+        self.levels = []
+        while len(b) > 1:
+            alpha = - a[1::2] / b[:-1:2]
+            gamma = - c[1::2] / b[2::2]
+            self.levels.append((a, b, c, alpha, gamma))
+            a, b, c = (alpha * a[:-1:2], b[1::2] + alpha * c[:-1:2] + gamma * a[2::2], gamma * c[2::2])
+        self.b = b
+
+    def solve(self, rhs):
+        '''Solve A x = rhs and return x'''
+        d = np.zeros(len(self.levels[0][1]) if self.levels else 1)
+        d[:self.n] = rhs
+        ds = []
+        for a, b, c, alpha, gamma in self.levels:
+            ds.append(d)
+            d = d[1::2] + alpha * d[:-1:2] + gamma * d[2::2]
+
+        x = d / self.b
+        for (a, b, c, alpha, gamma), d in reversed(zip(self.levels, ds)):
+            odd = np.concatenate(([0], x, [0]))
+            x = np.empty(len(d))
+            x[1::2] = odd[1:-1]
+            x[::2] = (d[::2] - a[::2] * odd[:-1] - c[::2] * odd[1:]) / b[::2]
+        return x[:self.n]
+
+
+def solve_tridiagonal(lower, diag, upper, rhs):
+    '''Solve A x = rhs by cyclic reduction, where A is tridiagonal: lower[i] = A[i][i-1] (lower[0] is not used),
+    diag[i] = A[i][i] and upper[i] = A[i][i+1] (upper[-1] is not used). A must not need pivoting, e.g. be
+    diagonally dominant like the matrices of the theta scheme.'''
+    return _Tridiagonal(np.asarray(lower, dtype=float), np.asarray(diag, dtype=float),
+                        np.asarray(upper, dtype=float)).solve(rhs)
+
+
+class PDEGrid(object):
+    '''The option values at the nodes of a grid of log spot prices log(spots[0]) + i * dx'''
+
+    def __init__(self, log_spot, dx, prices):
+        self.log_spot = log_spot # log of the lowest spot price
+        self.dx = dx
+        self.prices = prices
+        self.spots = np.exp(log_spot + dx * np.arange(len(prices)))
+
+    def get_deltas(self):
+        return self._get_dx(self.prices) / self.spots
+
+    def get_gammas(self):
+        v_x = self._get_dx(self.prices)
+        return (self._get_dx(v_x) - v_x) / self.spots**2
+
+    def _get_dx(self, v):
+        '''dv/dx by central differences, and second order one-sided ones at the ends'''
+        return np.gradient(v, self.dx, edge_order=2)
+
+    def get_greeks(self, spots):
+        '''Return a dict of the arrays of price, delta and gamma at spots, interpolated by the parabola
+        through the three nearest nodes. spots should be within the grid.'''
+        x = (np.log(np.asarray(spots, dtype=float)) - self.log_spot) / self.dx
+        i = np.clip(np.rint(x).astype(int), 1, len(self.prices) - 2)
+        t = x - i # the distance to the nearest node in steps
+
+        v = self.prices
+        v_x = (v[i + 1] - v[i - 1]) / 2         # dv/dx * dx at node i
+        v_xx = v[i + 1] - 2 * v[i] + v[i - 1]   # d2v/dx2 * dx**2
+        s = np.exp(self.log_spot + self.dx * x)
+
+        price = v[i] + t * v_x + t**2 / 2 * v_xx
+        dv_dx = (v_x + t * v_xx) / self.dx
+        return {'price': price, 'delta': dv_dx / s, 'gamma': (v_xx / self.dx**2 - dv_dx) / s**2}
+
+    def get_prices(self, spots):
+        return self.get_greeks(spots)['price']
+
+
+class FiniteDifference(Option):
+    '''Price options by the Crank-Nicolson scheme on a grid of space_steps + 1 log spot prices, spanning width
+    standard deviations vol * sqrt(expiry) on either side of the spot, or up to the barrier, and time_steps
+    steps of time, of which the first rannacher_steps are replaced by two fully implicit half steps each.'''
+
+    def __init__(self, spot, strike, rate, expiry, vol, coc=None, space_steps=200, time_steps=100,
+                 rannacher_steps=2, width=5.0):
+        super(FiniteDifference, self).__init__(spot, strike, rate, expiry, vol)
+
+        assert space_steps >= 4 and time_steps >= rannacher_steps >= 0, \
+            'Grid steps are {} {} {}'.format(space_steps, time_steps, rannacher_steps)
+
+        self.coc = rate if coc is None else coc # b: cost of carry
+        self.space_steps = space_steps
+        self.time_steps = time_steps
+        self.rannacher_steps = rannacher_steps
+        self.width = width
+
+    def get_option_price(self, otype, round_digit=4, american=False, bar=None, rebate=0, bar_type=BarrierType.OUT):
+        return round(float(self.solve(otype, american, bar, rebate, bar_type).get_prices(self.spot)), round_digit)
+
+    def get_greeks(self, otype, round_digit=4, american=False, bar=None, rebate=0, bar_type=BarrierType.OUT):
+        '''Return a dict of the price, delta and gamma at the spot price'''
+        greeks = self.solve(otype, american, bar, rebate, bar_type).get_greeks(self.spot)
+        return dict((k, round(float(v), round_digit)) for k, v in greeks.iteritems())
+
+    def solve(self, otype, american=False, bar=None, rebate=0, bar_type=BarrierType.OUT):
+        '''Return the PDEGrid of the option values at tau = expiry.
+
+        With a barrier bar, the grid ends at the barrier. The knock-out option is worth the rebate at the barrier.
+        The knock-in option, which pays the rebate at expiry if the barrier is not hit, is
+
+            vanilla - (knock-out without rebate) + rebate * (discounted probability of not hitting the barrier)
+
+        where the last two terms are the values of one knock-out option with the payoff less the rebate, so it
+        takes one solve too, and the vanilla prices come from the Black-Scholes formula.
+        '''
+        if otype == OptionType.CALL:
+            z = 1
+        elif otype == OptionType.PUT:
+            z = -1
+        else:
+            raise OptionTypeError
+
+        if bar is None or bar_type == BarrierType.OUT:
+            return self._solve(z, american, bar, rebate)
+        elif bar_type == BarrierType.IN:
+            if american:
+                raise ValueError('American knock-in options are not supported')
+            grid = self._solve(z, False, bar, 0, rebate)
+            vanilla = get_option_prices(grid.spots, self.strike, self.rate, self.expiry, self.vol, self.coc, otype)
+            return PDEGrid(grid.log_spot, grid.dx, vanilla - grid.prices)
+        else:
+            raise BarrierTypeError
+
+    def _get_grid(self, bar):
+        '''Return the lowest log spot price and the step of the grid'''
+        x0 = log(self.spot)
+        half = self.width * self.vol * sqrt(self.expiry)
+        if bar is None:
+            # The spot is the middle node
+            return x0 - half, 2 * half / (self.space_steps - self.space_steps % 2)
+        if bar == self.spot:
+            raise ValueError('The spot price is at the barrier {}'.format(bar))
+        lo, hi = (log(bar), x0 + half) if bar < self.spot else (x0 - half, log(bar))
+        return lo, (hi - lo) / self.space_steps
+
+    def _solve(self, z, american, bar, rebate, shift=0):
+        '''Roll the payoff less shift back to tau = expiry. rebate is the value at the barrier.'''
+        lo, dx = self._get_grid(bar)
+        n = self.space_steps + 1 - (self.space_steps % 2 if bar is None else 0)
+        spots = np.exp(lo + dx * np.arange(n))
+        s_lo, s_hi = spots[0], spots[-1]
+        strike, rate, coc = self.strike, self.rate, self.coc
+
+        intrinsic = np.maximum(z * (spots - strike), 0)
+        v = intrinsic - shift
+        if bar is not None:
+            v[0 if bar < self.spot else -1] = rebate
+
+        def get_boundary(tau, s):
+            value = exp(- rate * tau) * (max(z * (s * exp(coc * tau) - strike), 0) - shift)
+            return max(value, z * (s - strike)) if american else value
+
+        # The coefficients of L
+        a = self.vol**2 / (2 * dx**2)
+        m = (coc - self.vol**2 / 2) / (2 * dx)
+        c_lo, c_mid, c_hi = a - m, -2 * a - rate, a + m
+
+        dt = float(self.expiry) / self.time_steps
+        steps = [(dt / 2, 1.0)] * (2 * self.rannacher_steps) + [(dt, 0.5)] * (self.time_steps - self.rannacher_steps)
+        solvers = {}
+        tau = 0
+        for h, theta in steps:
+            tau += h
+            # The explicit part and the boundary values of the implicit part
+            rhs = v[1:-1] + (1 - theta) * h * (c_lo * v[:-2] + c_mid * v[1:-1] + c_hi * v[2:])
+            v_lo = rebate if bar is not None and bar < self.spot else get_boundary(tau, s_lo)
+            v_hi = rebate if bar is not None and bar > self.spot else get_boundary(tau, s_hi)
+            rhs[0] += theta * h * c_lo * v_lo
+            rhs[-1] += theta * h * c_hi * v_hi
+
+            lower, diag, upper = - theta * h * c_lo, 1 - theta * h * c_mid, - theta * h * c_hi
+            if american:
+                inner = self._penalize(lower, diag, upper, rhs, intrinsic[1:-1], v[1:-1])
+            else:
+                if (h, theta) not in solvers:
+                    solvers[h, theta] = _Tridiagonal(np.repeat(lower, n - 2), np.repeat(diag, n - 2),
+                                                     np.repeat(upper, n - 2))
+                inner = solvers[h, theta].solve(rhs)
+
+            v = np.concatenate(([v_lo], inner, [v_hi]))
+
+        return PDEGrid(lo, dx, v)
+
+    def _penalize(self, lower, diag, upper, rhs, intrinsic, guess):
+        '''Solve a step of an American option by the penalty method, starting from the exercised nodes of guess'''
+        exercised = guess <= intrinsic
+        lowers, uppers = np.repeat(lower, len(rhs)), np.repeat(upper, len(rhs))
+        for _ in xrange(len(rhs)):
+            penalty = PENALTY * exercised
+            v = _Tridiagonal(lowers, diag + penalty, uppers).solve(rhs + penalty * intrinsic)
+            now_exercised = v < intrinsic
+            if (now_exercised == exercised).all():
+                break
+            exercised = now_exercised
+        return v
+
+
+if __name__ == '__main__':
+    fd = FiniteDifference(100, 100, 0.08, 1, 0.3, 0.04)
+    print 'European call', fd.get_option_price(OptionType.CALL)
+    print 'American put', fd.get_greeks(OptionType.PUT, american=True)
+    print 'Down and out call', fd.get_option_price(OptionType.CALL, bar=90, rebate=3)
+    grid = fd.solve(OptionType.PUT, american=True)
+    ladder = np.arange(80, 121, 10)
+    for spot, price in zip(ladder, grid.get_prices(ladder)):
+        print spot, round(price, 4)
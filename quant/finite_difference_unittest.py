@@ -0,0 +1,97 @@
+from unittest import TestCase, main
+
+import numpy as np
+
+from barrier_options import BarrierType, BarrierTypeError, get_barrier_prices, get_barrier_greeks
+from binomial_trees import get_lattice_prices
+from black_scholes import get_option_prices
+from black_scholes_greeks import get_greeks
+from finite_difference import FiniteDifference, solve_tridiagonal
+from option import OptionType, OptionTypeError
+
+
+class FiniteDifferenceTestCase(TestCase):
+
+    def setUp(self):
+        self.fd = FiniteDifference(100, 100, 0.08, 1, 0.3, 0.04)
+
+    def test_solve_tridiagonal(self):
+        '''Cyclic reduction agrees with a dense solver whatever the size'''
+        rs = np.random.RandomState(1)
+        for n in (1, 2, 3, 4, 7, 8, 100):
+            lower, diag, upper, rhs = rs.rand(n), 3 + rs.rand(n), rs.rand(n), rs.rand(n)
+            a = np.diag(diag) + np.diag(lower[1:], -1) + np.diag(upper[:-1], 1)
+            self.assertTrue(np.allclose(np.linalg.solve(a, rhs), solve_tridiagonal(lower, diag, upper, rhs)))
+
+    def test_european(self):
+        '''Q: European options, spot price 100, strike price 100, risk free interest rate 8%, cost of carry 4%,
+        expiry 1 year, volatility 30%
+        A: within 0.005 of the Black-Scholes prices, and so are the other spots of the grid'''
+        for otype in (OptionType.CALL, OptionType.PUT):
+            expected = get_option_prices(100, 100, 0.08, 1, 0.3, 0.04, otype)
+            self.assertTrue(abs(self.fd.get_option_price(otype) - expected) < 0.005)
+
+            ladder = np.arange(70, 141, 5)
+            grid = self.fd.solve(otype)
+            expected = get_option_prices(ladder, 100, 0.08, 1, 0.3, 0.04, otype)
+            self.assertTrue(np.abs(grid.get_prices(ladder) - expected).max() < 0.005)
+
+    def test_convergence(self):
+        '''Crank-Nicolson with the Rannacher start-up is second order: doubling the grid divides the error by 4'''
+        expected = get_option_prices(100, 100, 0.08, 1, 0.3, 0.04, OptionType.CALL)
+        errors = [abs(FiniteDifference(100, 100, 0.08, 1, 0.3, 0.04, m, m // 2).get_option_price(OptionType.CALL, 8)
+                      - expected) for m in (100, 200)]
+        self.assertTrue(3 < errors[0] / errors[1] < 5)
+
+    def test_greeks(self):
+        '''Delta and gamma at the spot and across the grid are those of Black-Scholes'''
+        greeks = self.fd.get_greeks(OptionType.PUT)
+        expected = get_greeks(100, 100, 0.08, 1, 0.3, 0.04, OptionType.PUT)
+        self.assertAlmostEqual(expected['delta'], greeks['delta'], 3)
+        self.assertAlmostEqual(expected['gamma'], greeks['gamma'], 3)
+
+        grid = self.fd.solve(OptionType.CALL)
+        inner = (grid.spots > 60) & (grid.spots < 160)
+        expected = get_greeks(grid.spots[inner], 100, 0.08, 1, 0.3, 0.04, OptionType.CALL)
+        self.assertTrue(np.abs(grid.get_deltas()[inner] - expected['delta']).max() < 1e-3)
+        self.assertTrue(np.abs(grid.get_gammas()[inner] - expected['gamma']).max() < 1e-4)
+
+    def test_american(self):
+        '''Q: American options, spot prices 80 to 120, strike price 100, risk free interest rate 8%,
+        cost of carry 4%, expiry 1 year, volatility 30%
+        A: within 0.01 of a binomial tree with 5000 steps, and never below the intrinsic value'''
+        ladder = np.arange(80, 121, 10)
+        for otype in (OptionType.CALL, OptionType.PUT):
+            grid = self.fd.solve(otype, american=True)
+            expected = get_lattice_prices(ladder, 100, 0.08, 1, 0.3, 0.04, otype, 5000, american=True)
+            self.assertTrue(np.abs(grid.get_prices(ladder) - expected).max() < 0.01)
+            z = 1 if otype == OptionType.CALL else -1
+            self.assertTrue((grid.prices >= z * (grid.spots - 100) - 1e-6).all())
+
+    def test_barrier(self):
+        '''Q: barrier options, spot price 100, strike price 100, rebate 3, risk free interest rate 8%,
+        cost of carry 4%, expiry 1 year, volatility 30%, barriers 90 and 110
+        A: within 0.002 of the closed form, and so are the delta and gamma'''
+        for bar in (90, 110):
+            for otype in (OptionType.CALL, OptionType.PUT):
+                for bar_type in (BarrierType.IN, BarrierType.OUT):
+                    args = (100, 100, 0.08, 1, 0.3, 0.04, 3, bar, otype, bar_type)
+                    greeks = self.fd.get_greeks(otype, 6, bar=bar, rebate=3, bar_type=bar_type)
+                    self.assertTrue(abs(get_barrier_prices(*args) - greeks['price']) < 0.002)
+                    expected = get_barrier_greeks(*args)
+                    self.assertTrue(abs(expected['delta'] - greeks['delta']) < 0.002)
+                    self.assertTrue(abs(expected['gamma'] - greeks['gamma']) < 0.002)
+
+    def test_barrier_grid(self):
+        '''A knock-out grid ends at the barrier, where the option is worth the rebate'''
+        grid = self.fd.solve(OptionType.CALL, bar=90, rebate=3)
+        self.assertAlmostEqual(90, grid.spots[0])
+        self.assertEqual(3, grid.prices[0])
+        self.assertRaises(ValueError, self.fd.solve, OptionType.CALL, bar=100)
+        self.assertRaises(ValueError, self.fd.solve, OptionType.CALL, True, 90, 3, BarrierType.IN)
+        self.assertRaises(BarrierTypeError, self.fd.solve, OptionType.CALL, False, 90, 3, 2)
+        self.assertRaises(OptionTypeError, self.fd.solve, 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+'''
+Implied volatility: the volatility which makes the generalized Black-Scholes price equal to the market price.
+
+As the Black-Scholes price is strictly increasing in vol, the implied volatility is unique when the market
+price is within the no-arbitrage bounds:
+
+    call: max(S * exp((b - r) * T) - X * exp(-rT), 0) < c < S * exp((b - r) * T)
+    put:  max(X * exp(-rT) - S * exp((b - r) * T), 0) < p < X * exp(-rT)
+
+It is found by a safeguarded Newton iteration:
+
+    vol_new = vol - (price(vol) - market_price) / vega(vol)
+    where
+        vega = S * exp((b - r) * T) * n(d1) * sqrt(T)
+
+A bracket [vol_low, vol_high] which always contains the root is narrowed at each iteration. If a Newton step
+falls outside the bracket, e.g. when vega is tiny for a deep in/out of the money option, bisection is used
+for that step instead, so every contract converges. A price below the price at vol_low or above the price at
+vol_high has its root outside the bracket, and is reported as such instead of being iterated.
+
+All the contracts are iterated together on numpy arrays. A contract drops out as soon as it has converged.
+'''
+
+from math import pi, sqrt
+
+import numpy as np
+
+from option import OptionType, OptionTypeError, cdf_array
+
+
+class ImpliedVolStatus(object):
+    CONVERGED = 0
+    BELOW_LOWER_BOUND = 1 # the price is not above the intrinsic value
+    ABOVE_UPPER_BOUND = 2 # the price is not below the spot (call) or discounted strike (put)
+    NOT_CONVERGED = 3
+    OUT_OF_BRACKET = 4 # the implied volatility is not within [vol_low, vol_high]
+
+
+def get_implied_vols(price, spot, strike, rate, expiry, cost_of_carry, otype,
+                     tol=1e-10, max_iter=100, vol_low=1e-6, vol_high=10.0):
+    '''Back out the implied volatilities of a batch of market quotes.
+
+    Every argument can be a scalar or an array, they are broadcast against each other.
+    Return an array of implied volatilities and an array of ImpliedVolStatus codes of the broadcast shape.
+    The volatility is nan unless the status is ImpliedVolStatus.CONVERGED.
+
+    tol: a contract has converged when its price error or the width of its bracket is below tol
+    vol_low, vol_high: the initial bracket
+    '''
+    args = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in
+                                 (price, spot, strike, rate, expiry, cost_of_carry)])
+    shape = args[0].shape
+    price, spot, strike, rate, expiry, cost_of_carry = [v.ravel() for v in args]
+    otype = np.broadcast_to(np.asarray(otype), shape).ravel()
+    is_put = otype == OptionType.PUT
+    if not (is_put | (otype == OptionType.CALL)).all():
+        raise OptionTypeError
+    z = np.where(is_put, -1.0, 1.0)
+
+    fwd_term = spot * np.exp((cost_of_carry - rate) * expiry)
+    strike_term = strike * np.exp(- rate * expiry)
+    sqrt_t = np.sqrt(expiry)
+    log_moneyness = np.log(spot / strike)
+
+    vols = np.empty(price.shape)
+    vols.fill(np.nan)
+    status = np.empty(price.shape, dtype=int)
+    status.fill(ImpliedVolStatus.NOT_CONVERGED)
+
+    # No-arbitrage bounds
+    lower = np.maximum(z * (fwd_term - strike_term), 0)
+    upper = np.where(is_put, strike_term, fwd_term)
+    status[price <= lower] = ImpliedVolStatus.BELOW_LOWER_BOUND
+    status[price >= upper] = ImpliedVolStatus.ABOVE_UPPER_BOUND
+
+    def get_diffs(idx, vol):
+        '''Return the Black-Scholes prices less the market prices of the contracts idx at vol, and d1'''
+        vol_sqrt_t = vol * sqrt_t[idx]
+        d1 = (log_moneyness[idx] + (cost_of_carry[idx] + vol ** 2 / 2) * expiry[idx]) / vol_sqrt_t
+        zz = z[idx]
+        diff = zz * (fwd_term[idx] * cdf_array(zz * d1) - strike_term[idx] * cdf_array(zz * (d1 - vol_sqrt_t)))
+        return diff - price[idx], d1
+
+    idx = np.flatnonzero(status == ImpliedVolStatus.NOT_CONVERGED)
+    outside = (get_diffs(idx, vol_low)[0] > tol) | (get_diffs(idx, vol_high)[0] < -tol)
+    status[idx[outside]] = ImpliedVolStatus.OUT_OF_BRACKET
+    idx = idx[~outside]
+
+    low = np.empty(idx.shape)
+    low.fill(vol_low)
+    high = np.empty(idx.shape)
+    high.fill(vol_high)
+    # Initial guess of Manaster and Koehler, which makes d1 or d2 zero
+    vol = np.sqrt(2 * np.abs(log_moneyness[idx] + cost_of_carry[idx] * expiry[idx]) / expiry[idx])
+    vol[vol == 0] = 0.2
+    vol = np.clip(vol, vol_low, vol_high)
+
+    for i in xrange(max_iter):
+        if not len(idx):
+            break
+
+        # Price and vega of the contracts still active, sharing d1
+        diff, d1 = get_diffs(idx, vol)
+        vega = fwd_term[idx] * np.exp(- d1 ** 2 / 2) / sqrt(2 * pi) * sqrt_t[idx]
+
+        # Narrow the bracket
+        too_high = diff > 0
+        high[too_high] = vol[too_high]
+        low[~too_high] = vol[~too_high]
+
+        done = (np.abs(diff) <= tol) | (high - low <= tol)
+        vols[idx[done]] = vol[done]
+        status[idx[done]] = ImpliedVolStatus.CONVERGED
+
+        # Newton step, or bisection if it leaves the bracket
+        keep = ~done
+        idx, vol, diff, vega, low, high = idx[keep], vol[keep], diff[keep], vega[keep], low[keep], high[keep]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vol = vol - diff / vega
+        bisect = ~((vol > low) & (vol < high))
+        vol[bisect] = (low[bisect] + high[bisect]) / 2
+
+    return vols.reshape(shape), status.reshape(shape)
@@ -0,0 +1,76 @@
+from unittest import TestCase, main
+
+import numpy as np
+
+from black_scholes import BlackScholes, get_option_prices
+from implied_volatility import ImpliedVolStatus, get_implied_vols
+from option import OptionType
+
+
+class ImpliedVolatilityTestCase(TestCase):
+
+    def test_one_contract(self):
+        '''The vanilla call option of black_scholes_unittest: the price 2.1334 comes from volatility 30%'''
+        price = BlackScholes('stock_option', 60, 65, 0.08, 0.25, 0.3).get_option_price(OptionType.CALL, 12)
+        vol, status = get_implied_vols(price, 60, 65, 0.08, 0.25, 0.08, OptionType.CALL)
+        self.assertEqual(ImpliedVolStatus.CONVERGED, status)
+        self.assertAlmostEqual(0.3, float(vol), 8)
+
+        vol, status = get_implied_vols(2.1334, 60, 65, 0.08, 0.25, 0.08, OptionType.CALL)
+        self.assertAlmostEqual(0.3, float(vol), 4)
+
+    def test_round_trip(self):
+        '''Price a random book with known volatilities and back them out again'''
+        rs = np.random.RandomState(2)
+        num = 20000
+        spot = rs.uniform(50, 150, num)
+        strike = rs.uniform(50, 150, num)
+        rate = rs.uniform(0, 0.1, num)
+        expiry = rs.uniform(0.05, 3, num)
+        coc = rs.uniform(-0.05, 0.1, num)
+        vol = rs.uniform(0.05, 1.5, num)
+        otype = rs.randint(0, 2, num)
+
+        prices = get_option_prices(spot, strike, rate, expiry, vol, coc, otype)
+        vols, status = get_implied_vols(prices, spot, strike, rate, expiry, coc, otype)
+        # Deep in or out of the money options have almost no time value, so the price doesn't tell the vol
+        ok = status == ImpliedVolStatus.CONVERGED
+        self.assertTrue(ok.mean() > 0.99)
+        np.testing.assert_allclose(get_option_prices(spot[ok], strike[ok], rate[ok], expiry[ok], vols[ok],
+                                                     coc[ok], otype[ok]),
+                                   prices[ok], atol=1e-9)
+        meaningful = ok & (prices - np.maximum(np.where(otype, -1, 1) * (spot * np.exp((coc - rate) * expiry) -
+                                                                         strike * np.exp(- rate * expiry)), 0) > 1e-3)
+        np.testing.assert_allclose(vols[meaningful], vol[meaningful], atol=1e-5)
+
+    def test_no_arbitrage_violations(self):
+        '''Quotes outside the no-arbitrage bounds get a status code and nan'''
+        df = np.exp(- 0.05 * 2)
+        prices = np.array([[10, 50 - 52 * df - 0.01, 50, 6.7601],
+                           [52 * df - 50, 60, 52 * df + 1e-3, 6.7601]])
+        otypes = np.array([[OptionType.CALL] * 4, [OptionType.PUT] * 4])
+        vols, status = get_implied_vols(prices, 50, 52, 0.05, 2, 0.05, otypes)
+        self.assertEqual([[ImpliedVolStatus.CONVERGED, ImpliedVolStatus.BELOW_LOWER_BOUND,
+                           ImpliedVolStatus.ABOVE_UPPER_BOUND, ImpliedVolStatus.CONVERGED],
+                          [ImpliedVolStatus.BELOW_LOWER_BOUND, ImpliedVolStatus.ABOVE_UPPER_BOUND,
+                           ImpliedVolStatus.ABOVE_UPPER_BOUND, ImpliedVolStatus.CONVERGED]],
+                         status.tolist())
+        self.assertTrue(np.isnan(vols[status != ImpliedVolStatus.CONVERGED]).all())
+        self.assertAlmostEqual(0.3, vols[1, 3], 4)
+
+    def test_out_of_bracket(self):
+        '''Q: a call priced at volatility 12 and at 0.3, spot price 50, strike price 52, risk free interest rate 5%,
+        expiry 3 weeks, with the bracket [1e-6, 10]
+        A: OUT_OF_BRACKET and nan for the first, 0.3 for the second'''
+        prices = get_option_prices(50, 52, 0.05, 0.06, np.array([12, 0.3]), 0.05, OptionType.CALL)
+        vols, status = get_implied_vols(prices, 50, 52, 0.05, 0.06, 0.05, OptionType.CALL)
+        self.assertEqual([ImpliedVolStatus.OUT_OF_BRACKET, ImpliedVolStatus.CONVERGED], status.tolist())
+        self.assertTrue(np.isnan(vols[0]))
+        self.assertAlmostEqual(0.3, vols[1], 8)
+        vols, status = get_implied_vols(prices, 50, 52, 0.05, 0.06, 0.05, OptionType.CALL, vol_low=0.5, vol_high=20)
+        self.assertEqual([ImpliedVolStatus.CONVERGED, ImpliedVolStatus.OUT_OF_BRACKET], status.tolist())
+        self.assertAlmostEqual(12, vols[0], 6)
+
+
+if __name__ == '__main__':
+    main()
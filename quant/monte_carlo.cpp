@@ -0,0 +1,191 @@
+/*
+ * This is the c++ implementation of the Monte Carlo simulation - counter part of MonteCarlo.simulate
+ *
+ * It is built as the extension module quant._monte_carlo by setup.py:
+ *     python setup.py build_ext --inplace
+ *
+ * and used by MonteCarlo.simulate_native and MonteCarlo.run when it is available.
+ *
+ * The paths are simulated in chunks like MonteCarlo.simulate: chunk k takes its random numbers from a 64-bit
+ * Mersenne Twister seeded by the key (seed, run_id, worker_id, k) through std::seed_seq, see random_streams.py.
+ * The chunks are shared out to the threads, each of them writes the sums of its chunks to the buffer given
+ * by the caller, and the sums are added up in order of k, so the result doesn't depend on the number of threads.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <algorithm>
+#include <atomic>
+#include <cmath>
+#include <cstring>
+#include <random>
+#include <thread>
+#include <vector>
+
+
+/*
+ * The inverse of the standard normal cumulative distribution, the same algorithm as option.norminv
+ */
+static double norminv(double p)
+{
+    static const double a[] = {-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+                               1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00};
+    static const double b[] = {-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+                               6.680131188771972e+01, -1.328068155288572e+01};
+    static const double c[] = {-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+                               -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00};
+    static const double d[] = {7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+                               3.754408661907416e+00};
+    const double low = 0.02425;
+    const double high = 1 - low;
+    double q, r;
+
+    if (p < low)
+    {
+        // Rational approximation for lower region
+        q = std::sqrt(-2 * std::log(p));
+        return (((((c[0]*q+c[1])*q+c[2])*q+c[3])*q+c[4])*q+c[5]) / ((((d[0]*q+d[1])*q+d[2])*q+d[3])*q+1);
+    }
+    else if (p > high)
+    {
+        // Rational approximation for upper region
+        q = std::sqrt(-2 * std::log(1 - p));
+        return -(((((c[0]*q+c[1])*q+c[2])*q+c[3])*q+c[4])*q+c[5]) / ((((d[0]*q+d[1])*q+d[2])*q+d[3])*q+1);
+    }
+    else
+    {
+        // Rational approximation for central region
+        q = p - 0.5;
+        r = q * q;
+        return (((((a[0]*r+a[1])*r+a[2])*r+a[3])*r+a[4])*r+a[5])*q / (((((b[0]*r+b[1])*r+b[2])*r+b[3])*r+b[4])*r+1);
+    }
+}
+
+
+struct Contract
+{
+    double z; // 1 for a call and -1 for a put
+    double spot, strike, drift, diffusion; // St = spot * exp(drift + diffusion * eps)
+};
+
+
+/*
+ * Simulate num paths from the stream (seed, run_id, worker_id, chunk_id) and
+ * write the sum of the payoffs and the sum of their squares to sums[0] and sums[1]
+ */
+static void simulate_chunk(const Contract &c, long num, unsigned long seed, unsigned long run_id,
+                           unsigned long worker_id, unsigned long chunk_id, double *sums)
+{
+    std::seed_seq key = {seed, run_id, worker_id, chunk_id};
+    std::mt19937_64 gen(key);
+
+    double sum = 0, sum_sq = 0;
+    for (long i = 0; i < num; ++i)
+    {
+        // 53 random bits, moved by half a step to be in the open interval (0, 1)
+        double u = ((gen() >> 11) + 0.5) / 9007199254740992.0;
+        double payoff = std::max(c.z * (c.spot * std::exp(c.drift + c.diffusion * norminv(u)) - c.strike), 0.0);
+        sum += payoff;
+        sum_sq += payoff * payoff;
+    }
+
+    sums[0] = sum;
+    sums[1] = sum_sq;
+}
+
+
+static PyObject *py_simulate(PyObject *self, PyObject *args)
+{
+    Contract c;
+    double rate, expiry, vol, cost_of_carry;
+    long simu_num, chunk_size;
+    unsigned long seed, run_id, worker_id;
+    int thread_num;
+    PyObject *out_obj;
+
+    if (!PyArg_ParseTuple(args, "dddddddllkkkiO:simulate", &c.z, &c.spot, &c.strike, &rate, &expiry, &vol,
+                          &cost_of_carry, &simu_num, &chunk_size, &seed, &run_id, &worker_id, &thread_num, &out_obj))
+        return NULL;
+    if (simu_num < 2 || chunk_size <= 0)
+        return PyErr_Format(PyExc_ValueError, "simu_num must be at least 2 and chunk_size positive");
+    c.drift = (cost_of_carry - vol * vol / 2) * expiry;
+    c.diffusion = vol * std::sqrt(expiry);
+
+    long chunk_num = (simu_num + chunk_size - 1) / chunk_size;
+    Py_buffer out;
+    if (PyObject_GetBuffer(out_obj, &out, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | PyBUF_WRITABLE) < 0)
+        return NULL;
+    if (out.itemsize != sizeof(double) || !out.format || std::strcmp(out.format, "d") != 0 ||
+        out.len != 2 * chunk_num * (Py_ssize_t)sizeof(double))
+    {
+        PyBuffer_Release(&out);
+        return PyErr_Format(PyExc_ValueError, "out must be a contiguous buffer of %ld doubles", 2 * chunk_num);
+    }
+    double *sums = (double *)out.buf;
+
+    if (thread_num <= 0)
+        thread_num = std::max(1u, std::thread::hardware_concurrency());
+    thread_num = (int)std::min((long)thread_num, chunk_num);
+
+    Py_BEGIN_ALLOW_THREADS
+    // Each thread takes the next chunk until there is none left
+    std::atomic<long> next(0);
+    auto work = [&]() {
+        for (long k = next++; k < chunk_num; k = next++)
+            simulate_chunk(c, std::min(chunk_size, simu_num - k * chunk_size), seed, run_id, worker_id,
+                           (unsigned long)k, sums + 2 * k);
+    };
+    std::vector<std::thread> threads;
+    for (int i = 1; i < thread_num; ++i)
+        threads.push_back(std::thread(work));
+    work();
+    for (size_t i = 0; i < threads.size(); ++i)
+        threads[i].join();
+    Py_END_ALLOW_THREADS
+
+    double sum = 0, sum_sq = 0;
+    for (long k = 0; k < chunk_num; ++k)
+    {
+        sum += sums[2 * k];
+        sum_sq += sums[2 * k + 1];
+    }
+    PyBuffer_Release(&out);
+
+    double discount = std::exp(- rate * expiry);
+    double mean = sum / simu_num;
+    double var = std::max(sum_sq - simu_num * mean * mean, 0.0) / (simu_num - 1);
+    return Py_BuildValue("dd", discount * mean, discount * std::sqrt(var / simu_num));
+}
+
+
+static PyMethodDef methods[] = {
+    {"simulate", py_simulate, METH_VARARGS,
+     "simulate(z, spot, strike, rate, expiry, vol, cost_of_carry, simu_num, chunk_size, seed, run_id, worker_id,\n"
+     "         thread_num, out)\n\n"
+     "Simulate simu_num paths in chunks of chunk_size across thread_num threads (0 for one per core) and\n"
+     "return the price and its standard error. z is 1 for a call and -1 for a put. The sum of the payoffs and\n"
+     "the sum of their squares of chunk k are written to out[2 * k] and out[2 * k + 1]."},
+    {NULL, NULL, 0, NULL}
+};
+
+
+#if PY_MAJOR_VERSION >= 3
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, "_monte_carlo", "Native Monte Carlo simulation", -1, methods
+};
+
+PyMODINIT_FUNC PyInit__monte_carlo(void)
+{
+    return PyModule_Create(&module);
+}
+
+#else
+
+PyMODINIT_FUNC init_monte_carlo(void)
+{
+    Py_InitModule3("_monte_carlo", methods, "Native Monte Carlo simulation");
+}
+
+#endif
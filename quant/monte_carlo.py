@@ -12,48 +12,450 @@ For each path of simulation, the final price is:
 The overall price is:
     sum(each_price) * exp(rate * T) / simu_num
 
+and its standard error is:
+    exp(- rate * T) * sqrt((sum(each_price**2) - simu_num * mean**2) / (simu_num - 1)) / sqrt(simu_num)
+    where mean = sum(each_price) / simu_num
+
+MonteCarlo.run simulates one path at a time. MonteCarlo.simulate does the same with numpy: 
+the paths are simulated in chunks of at most chunk_size paths, so the memory used is bounded 
+whatever simu_num is, and only the sums of the payoffs and of their squares are kept.
+Each chunk takes its random numbers from a stream of its own, see random_streams.
+
+Variance reduction:
+    antithetic variates: each random number rand is also used as -rand, the two payoffs are averaged
+    control variate: the final price St, whose expectation spot * exp(b * T) is known, see ControlVariateResult
+
+Quasi-Monte Carlo:
+    MonteCarlo.simulate_qmc takes the numbers from randomized low-discrepancy sequences instead, 
+    see random_streams. For these smooth payoffs the error decreases nearly as 1 / simu_num 
+    instead of 1 / sqrt(simu_num).
+
+simulate_ladder prices calls and puts of many strikes from one set of paths.
+
+The path-dependent simulations (asian_options, barrier_options) step their paths through a schedule of
+fixings with get_fixings and get_time_steps, chunk by chunk with iter_chunks.
+
+MonteCarlo.simulate_native runs the same chunked simulation in C++ threads, see monte_carlo.cpp.
+MonteCarlo.run uses it when it is built, unless told not to with native=False.
+
+MonteCarlo.simulate_until simulates chunk by chunk and stops once the standard error reaches a target
+or a time budget is spent, instead of simulating a fixed simu_num.
 '''
+import time
+from copy import copy
 from math import exp, sqrt
+from multiprocessing import Process, Queue
 from random import random
 
-from option import Option, OptionType, OptionTypeError, norminv
+import numpy as np
+
+from option import Option, OptionType, OptionTypeError, norminv, norminv_array
+from random_streams import RandomStreams, get_scrambled_halton
+
+try:
+    import _monte_carlo # the native simulation built from monte_carlo.cpp by setup.py
+except ImportError:
+    _monte_carlo = None
+
+CHUNK_SIZE = 100000 # the number of paths simulated at a time by numpy
+
+
+class MonteCarloResult(object):
+    '''The sums of simulated payoffs, from which the price and its standard error are derived.
+    Results of independent simulations of the same contract can be merged into one.'''
+
+    def __init__(self, discount, num=0, sum_=0.0, sum_sq=0.0):
+        # The sums, arrays for many contracts, are rebound and never changed in place, 
+        # so a copy of a result can be added to or merged without changing the result copied
+        self.discount = discount # exp(- rate * T)
+        self.num = num
+        self.sum_ = sum_
+        self.sum_sq = sum_sq
+
+    def add(self, payoffs):
+        '''Add an array of simulated payoffs. 
+        A 2-D array of payoffs, one column per contract, makes the sums, the prices and their standard errors arrays.'''
+        self.num += len(payoffs)
+        self.sum_ = self.sum_ + payoffs.sum(axis=0)
+        self.sum_sq = self.sum_sq + np.einsum('i...,i...->...', payoffs, payoffs)
+
+    def merge(self, other):
+        self.num += other.num
+        self.sum_ = self.sum_ + other.sum_
+        self.sum_sq = self.sum_sq + other.sum_sq
+
+    def get_price(self):
+        return self.discount * self.sum_ / self.num
+
+    def get_std_err(self):
+        mean = self.sum_ / self.num
+        var = np.maximum(self.sum_sq - self.num * mean * mean, 0) / (self.num - 1)
+        return self.discount * np.sqrt(var / self.num)
+
+    def get_conf_interval(self, z=1.96):
+        '''Return the confidence interval of the price, 95% by default'''
+        price = self.get_price()
+        std_err = self.get_std_err()
+        return price - z * std_err, price + z * std_err
+
+
+class ControlVariateResult(MonteCarloResult):
+    '''The sums of simulated payoffs y and of a control variate x whose expectation is known.
+    The price is estimated by
+
+        mean(y) - beta * (mean(x) - E(x))
+        where beta = cov(x, y) / var(x)
+
+    which has the variance of the residual of y regressed on x. beta is estimated from all the samples.
+    '''
+
+    def __init__(self, discount, control_mean, num=0, sum_=0.0, sum_sq=0.0, 
+                 control_sum=0.0, control_sum_sq=0.0, cross_sum=0.0):
+        super(ControlVariateResult, self).__init__(discount, num, sum_, sum_sq)
+        self.control_mean = control_mean # E(x)
+        self.control_sum = control_sum
+        self.control_sum_sq = control_sum_sq
+        self.cross_sum = cross_sum
+
+    def add(self, payoffs, controls):
+        '''Add an array of simulated payoffs and the array of their control variates'''
+        super(ControlVariateResult, self).add(payoffs)
+        self.control_sum = self.control_sum + controls.sum()
+        self.control_sum_sq = self.control_sum_sq + np.dot(controls, controls)
+        self.cross_sum = self.cross_sum + np.dot(payoffs, controls)
+
+    def merge(self, other):
+        super(ControlVariateResult, self).merge(other)
+        self.control_sum = self.control_sum + other.control_sum
+        self.control_sum_sq = self.control_sum_sq + other.control_sum_sq
+        self.cross_sum = self.cross_sum + other.cross_sum
+
+    def _get_moments(self):
+        '''Return the means of y and x, the variance of x and the covariance of x and y, multiplied by num'''
+        mean = self.sum_ / self.num
+        control_mean = self.control_sum / self.num
+        sxx = self.control_sum_sq - self.num * control_mean * control_mean
+        sxy = self.cross_sum - self.num * control_mean * mean
+        return mean, control_mean, sxx, sxy
+
+    def get_beta(self):
+        mean, control_mean, sxx, sxy = self._get_moments()
+        return sxy / sxx if sxx > 0 else 0.0
+
+    def get_price(self):
+        mean, control_mean, sxx, sxy = self._get_moments()
+        return self.discount * (mean - self.get_beta() * (control_mean - self.control_mean))
+
+    def get_std_err(self):
+        mean, control_mean, sxx, sxy = self._get_moments()
+        syy = self.sum_sq - self.num * mean * mean
+        var = max(syy - self.get_beta() * sxy, 0) / (self.num - 2)
+        return self.discount * sqrt(var / self.num)
+
+
+def merge_results(results):
+    '''Merge the MonteCarloResults of independent simulations of the same contract, 
+    e.g. the shards of a run split across hosts, in the order given. The results are not changed.'''
+    merged = copy(results[0])
+    for result in results[1:]:
+        merged.merge(result)
+
+    return merged
+
+
+def get_fixings(fixings, expiry):
+    '''Return the array of fixing times given fixings: the number of fixings evenly spaced until expiry, 
+    or an increasing sequence of fixing times in (0, expiry]'''
+    if isinstance(fixings, (int, long)):
+        times = np.linspace(0, expiry, fixings + 1)[1:]
+    else:
+        times = np.asarray(fixings, dtype=float)
+    assert len(times) and times[0] > 0 and (np.diff(times) > 0).all() and times[-1] <= expiry, \
+           'Fixings must be increasing in (0, expiry]: {}'.format(times)
+    return times
+
+
+def get_time_steps(times, expiry):
+    '''Return the times the paths are stepped to, i.e. the fixing times followed by expiry if it is not one 
+    of them, the lengths of the steps, and a list of whether each step ends at a fixing'''
+    fixed = [True] * len(times)
+    if times[-1] < expiry:
+        times = np.append(times, expiry)
+        fixed.append(False)
+    return times, np.diff(np.concatenate(([0], times))), fixed
+
+
+def iter_chunks(simu_num, chunk_size, streams, worker_id=0):
+    '''Yield the number of paths and the numpy.random.RandomState of each chunk of a simulation of simu_num 
+    paths split in chunks of chunk_size. Chunk k uses the stream (seed, run_id, worker_id, k) of streams, 
+    so the memory used is O(chunk_size) however many random numbers a path takes.'''
+    for k in xrange((simu_num + chunk_size - 1) // chunk_size):
+        yield min(chunk_size, simu_num - k * chunk_size), streams.get_random_state(worker_id, k)
+
+
+def simulate_ladder(spot, strikes, rate, expiry, vol, simu_num, coc=None, chunk_size=10000, seed=None, 
+                    run_id=0, worker_id=0):
+    '''Price calls and puts for a whole array of strikes from one set of simulated final prices.
+    For a ladder of expiries, call it once per expiry.
+
+    Return two MonteCarloResults, for calls and for puts, whose prices and standard errors are arrays by strike.
+    As all the strikes share the same paths (common random numbers), the prices are consistent across strikes:
+    e.g. call prices always decrease and are convex in the strike, so there is no spurious butterfly arbitrage.
+    The random streams are the same as MonteCarlo.simulate with the same chunk_size, seed, run_id and worker_id.
+    Memory used is bounded by chunk_size * len(strikes).
+    '''
+    mc = MonteCarlo(spot, None, rate, expiry, vol, coc)
+    strikes = np.asarray(strikes, dtype=float)
+    streams = RandomStreams(seed, run_id)
+    discount = exp(- rate * expiry)
+    calls = MonteCarloResult(discount)
+    puts = MonteCarloResult(discount)
+
+    for k in xrange((simu_num + chunk_size - 1) // chunk_size):
+        num = min(chunk_size, simu_num - k * chunk_size)
+        st = mc.get_terminal_prices(norminv_array(streams.get_uniforms(num, worker_id, k)))
+        payoffs = st[:, np.newaxis] - strikes
+        puts.add(np.maximum(- payoffs, 0))
+        calls.add(np.maximum(payoffs, 0, out=payoffs))
+
+    calls.seed = puts.seed = streams.seed
+    return calls, puts
 
 
 class MonteCarlo(Option):
     def __init__(self, spot, strike, rate, expiry, vol, coc=None):
         super(MonteCarlo, self).__init__(spot, strike, rate, expiry, vol)
         
-        self.cost_of_carry = coc if coc else rate
+        self.cost_of_carry = rate if coc is None else coc
     
-    def get_price_of_one_run(self, z):
-        '''Run the simulation once and return the option price'''
-        st = self.spot * exp((self.cost_of_carry - self.vol**2 / 2) * self.expiry + self.vol * norminv(random()) * sqrt(self.expiry))
+    def get_price_of_one_run(self, z, u=None):
+        '''Run the simulation once with the uniform random number u (a new one if None) and return the option price'''
+        u = random() if u is None else u
+        st = self.spot * exp((self.cost_of_carry - self.vol**2 / 2) * self.expiry + self.vol * norminv(u) * sqrt(self.expiry))
         return max(z * (st - self.strike), 0)
     
-    def _ps_slice(self, z, num, resultq):
-        sum_ = 0
-        for i in xrange(num):
-            sum_ += self.get_price_of_one_run(z)
-            
-        resultq.put(sum_)
+    def _ps_slice(self, z, simu_num, chunk_size, streams, worker_id, chunk_ids, options, resultq):
+        '''Simulate the chunks chunk_ids in a child process and put the sums of each of them on resultq'''
+        resultq.put([(k, self._simulate_chunk(z, simu_num, chunk_size, streams, worker_id, k, *options)) 
+                     for k in chunk_ids])
         resultq.close()
     
-    def run(self, opt_type, simu_num, ps_num=10):
+    def get_terminal_prices(self, eps):
+        '''Turn an array of standard normal random numbers into final prices in place'''
+        eps *= self.vol * sqrt(self.expiry)
+        eps += (self.cost_of_carry - self.vol**2 / 2) * self.expiry
+        np.exp(eps, out=eps)
+        eps *= self.spot
+        return eps
+
+    def get_payoffs(self, z, st):
+        '''Turn an array of final prices into payoffs in place'''
+        st -= self.strike
+        st *= z
+        return np.maximum(st, 0, out=st)
+
+    def get_chunk_result(self, z, eps, antithetic=False, control_variate=False):
+        '''Simulate the paths driven by an array of standard normal random numbers eps 
+        and return a MonteCarloResult of them. eps is overwritten.
+
+        antithetic: simulate a second path with -eps for each number, and take the average payoff 
+                    of the pair as one sample
+        control_variate: use the final price as a control variate. Its expectation is known in closed
+                         form: exp(b * T) * spot, i.e. the Black-Scholes price of a call with strike 0
+                         before discounting.
         '''
-        simu_num: the number of simulation runs, usually > 100000
+        discount = exp(- self.rate * self.expiry)
+        if antithetic:
+            st2 = self.get_terminal_prices(-eps)
+        st = self.get_terminal_prices(eps)
+
+        if control_variate:
+            result = ControlVariateResult(discount, self.spot * exp(self.cost_of_carry * self.expiry))
+            controls = (st + st2) / 2 if antithetic else st.copy()
+        else:
+            result = MonteCarloResult(discount)
+
+        payoffs = self.get_payoffs(z, st)
+        if antithetic:
+            payoffs += self.get_payoffs(z, st2)
+            payoffs /= 2
+
+        if control_variate:
+            result.add(payoffs, controls)
+        else:
+            result.add(payoffs)
+        return result
+
+    def simulate(self, opt_type, simu_num, chunk_size=CHUNK_SIZE, seed=None, ps_num=0, run_id=0, worker_id=0,
+                 antithetic=False, control_variate=False):
+        '''Run the simulation with numpy, chunk_size samples at a time, and return a MonteCarloResult
+
+        seed: the seed of the random numbers, for repeatable results. 
+              If None, a seed is drawn from the operating system; it is kept in result.seed.
         ps_num: If zero, run simulation in single process mode;
-                otherwise run in multiprocess mode with ps_num processes to speed up 
+                otherwise split the chunks across ps_num processes.
+        run_id, worker_id: see random_streams. To split a run across hosts, give each host the same 
+                           seed and run_id but its own worker_id, then merge the results with merge_results.
+        antithetic, control_variate: variance reduction, see get_chunk_result. 
+                                     With antithetic, each of the simu_num samples is a pair of paths.
+
+        Chunk k always uses the random stream (seed, run_id, worker_id, k) and the sums of the chunks 
+        are added up in order of k, so the result is the same bit for bit whatever ps_num is.
+        '''
+        z = self._get_z(opt_type)
+        streams = RandomStreams(seed, run_id)
+        chunk_num = (simu_num + chunk_size - 1) // chunk_size
+        options = (antithetic, control_variate)
+
+        if not ps_num:
+            partials = [(k, self._simulate_chunk(z, simu_num, chunk_size, streams, worker_id, k, *options)) 
+                        for k in xrange(chunk_num)]
+        else:
+            resultq = Queue()
+            processes = [Process(target=self._ps_slice, 
+                                 args=(z, simu_num, chunk_size, streams, worker_id, range(i, chunk_num, ps_num), 
+                                       options, resultq))
+                         for i in range(ps_num)]
+            for p in processes:
+                p.start()
+            # Take the partial sums before joining
+            partials = sorted(sum((resultq.get() for p in processes), []))
+            for p in processes:
+                p.join()
+
+        result = merge_results([partial for k, partial in partials])
+        result.seed = streams.seed
+        return result
+
+    def simulate_native(self, opt_type, simu_num, chunk_size=CHUNK_SIZE, seed=None, run_id=0, worker_id=0, 
+                        thread_num=0):
+        '''Run the simulation with the native code in thread_num threads (0 for one per core) without holding 
+        the GIL, and return a MonteCarloResult. The other arguments are the same as simulate.
+
+        The chunks use the same keys as simulate but the native random numbers, so the result is not the same 
+        as simulate's; it is the same bit for bit whatever thread_num is.
         '''
+        if _monte_carlo is None:
+            raise RuntimeError('The native simulation is not built, run setup.py build_ext')
+
+        z = self._get_z(opt_type)
+        streams = RandomStreams(seed, run_id)
+        sums = np.empty(((simu_num + chunk_size - 1) // chunk_size, 2))
+        _monte_carlo.simulate(z, self.spot, self.strike, self.rate, self.expiry, self.vol, self.cost_of_carry, 
+                              simu_num, chunk_size, streams.seed, run_id, worker_id, thread_num, sums)
+
+        sum_, sum_sq = sums.sum(axis=0)
+        result = MonteCarloResult(exp(- self.rate * self.expiry), simu_num, sum_, sum_sq)
+        result.seed = streams.seed
+        return result
+
+    def simulate_until(self, opt_type, target_std_err=None, time_budget=None, max_num=None, 
+                       chunk_size=10000, seed=None, run_id=0, worker_id=0, antithetic=False, control_variate=False):
+        '''Run the simulation chunk by chunk until the standard error of the price is not above target_std_err, 
+        time_budget seconds have passed or max_num samples are simulated, whichever comes first.
+        Return a MonteCarloResult. The other arguments are the same as simulate.
+        '''
+        if target_std_err is None and time_budget is None and max_num is None:
+            raise ValueError('One of "target_std_err", "time_budget" and "max_num" must be given')
+
+        t0 = time.time()
+        z = self._get_z(opt_type)
+        streams = RandomStreams(seed, run_id)
+        k = 0
+        while True:
+            simu_num = (k + 1) * chunk_size if max_num is None else max_num # cut the last chunk short at max_num
+            partial = self._simulate_chunk(z, simu_num, chunk_size, streams, worker_id, k, antithetic, control_variate)
+            if k == 0:
+                result = partial
+            else:
+                result.merge(partial)
+            k += 1
+
+            if target_std_err is not None and result.get_std_err() <= target_std_err:
+                break
+            if time_budget is not None and time.time() - t0 >= time_budget:
+                break
+            if max_num is not None and result.num >= max_num:
+                break
+
+        result.seed = streams.seed
+        return result
+
+    def simulate_qmc(self, opt_type, simu_num, replications=16, chunk_size=CHUNK_SIZE, seed=None, run_id=0, 
+                     antithetic=False, control_variate=False):
+        '''Run the simulation with quasi-random numbers instead of random ones and return a MonteCarloResult.
+
+        The random numbers are replaced by a scrambled Halton sequence (see random_streams) mapped by norminv.
+        simu_num points are split across independent scramblings of the sequence. Each replication gives 
+        an estimate of the price; the price is their average and the standard error comes from their spread,
+        so result.num is the number of replications.
+        Every replication takes simu_num // replications points, so that the estimates are identically
+        distributed; the remainder of simu_num is not simulated. simu_num must be at least replications.
+        '''
+        assert simu_num >= replications, \
+            'simu_num {} is less than the number of replications {}'.format(simu_num, replications)
+        z = self._get_z(opt_type)
+        streams = RandomStreams(seed, run_id)
+        num = simu_num // replications
+        discount = exp(- self.rate * self.expiry)
+
+        estimates = np.empty(replications)
+        for i in xrange(replications):
+            replication = None
+            for start in xrange(0, num, chunk_size):
+                # Same permutations for every chunk of a replication
+                u = get_scrambled_halton(min(chunk_size, num - start), 1, streams.get_random_state(0, i), start)
+                partial = self.get_chunk_result(z, norminv_array(u[:, 0]), antithetic, control_variate)
+                if replication is None:
+                    replication = partial
+                else:
+                    replication.merge(partial)
+            estimates[i] = replication.get_price() / discount
+
+        result = MonteCarloResult(discount)
+        result.add(estimates)
+        result.seed = streams.seed
+        return result
+
+    def _simulate_chunk(self, z, simu_num, chunk_size, streams, worker_id, chunk_id, 
+                        antithetic=False, control_variate=False):
+        num = min(chunk_size, simu_num - chunk_id * chunk_size)
+        eps = norminv_array(streams.get_uniforms(num, worker_id, chunk_id))
+        return self.get_chunk_result(z, eps, antithetic, control_variate)
+
+    def _get_z(self, opt_type):
         if opt_type == OptionType.CALL:
-            z = 1
+            return 1
         elif opt_type == OptionType.PUT:
-            z = -1
+            return -1
         else:
             raise OptionTypeError
 
+    def run(self, opt_type, simu_num, ps_num=10, native=None, seed=None):
+        '''
+        simu_num: the number of simulation runs, usually > 100000
+        ps_num: If zero, run simulation in single process mode;
+                otherwise run in multiprocess mode with ps_num processes to speed up.
+        native: use the native simulation, in one thread per core instead of ps_num processes. 
+                If None, use it when it is built; if True, raise RuntimeError when it is not built.
+        seed: the seed of the random numbers, for repeatable results. In single process mode the paths take
+              their numbers from the stream (seed, 0, 0, 0), the same as a single chunk of simulate.
+        '''
+        if native is None:
+            native = _monte_carlo is not None
+        if native:
+            return round(self.simulate_native(opt_type, simu_num, seed=seed).get_price(), 4)
+        if ps_num:
+            return round(self.simulate(opt_type, simu_num, ps_num=ps_num, seed=seed).get_price(), 4)
+
+        z = self._get_z(opt_type)
         sum_ = 0
         # single process mode
-        for i in xrange(simu_num):
-            sum_ += self.get_price_of_one_run(z)
+        if seed is None:
+            for i in xrange(simu_num):
+                sum_ += self.get_price_of_one_run(z)
+        else:
+            for u in RandomStreams(seed).iter_uniforms(simu_num):
+                sum_ += self.get_price_of_one_run(z, u)
 
         return round(exp(- self.rate * self.expiry) * sum_ / simu_num, 4)
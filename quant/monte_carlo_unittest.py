@@ -1,8 +1,14 @@
-from unittest import TestCase, main
+from unittest import TestCase, main, skipIf
 import time
+from math import sqrt
 
-from monte_carlo import MonteCarlo
+import numpy as np
+
+from black_scholes import BlackScholes, get_option_prices
+import monte_carlo
+from monte_carlo import MonteCarlo, merge_results, simulate_ladder
 from option import OptionType
+from random_streams import RandomStreams
 
 
 class MonteCarloTestCase(TestCase):
@@ -15,16 +21,235 @@ class MonteCarloTestCase(TestCase):
         risk-free rate 5%, volatility 30%
         '''
         mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
-        self.assertAlmostEqual(6.7601, mc.run(OptionType.PUT, 300000, 0), 1) # single process
+        self.assertAlmostEqual(6.7601, mc.run(OptionType.PUT, 300000, 0, native=False), 1) # single process
 
     def test_eu_call_opt_with_mp(self):
         '''Run the same test but in multiprocess mode
         '''
         mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
-        self.assertAlmostEqual(6.7601, mc.run(OptionType.PUT, 300000, 4), 1) # 4 processes seems to be the fastest on a quad-core pc
+        self.assertAlmostEqual(6.7601, mc.run(OptionType.PUT, 300000, 4, native=False), 1) # 4 processes seems to be the fastest on a quad-core pc
+
+    def test_run_seed(self):
+        '''A seeded single process run draws its numbers in chunks from the stream of a single chunk of simulate'''
+        streams = RandomStreams(13)
+        self.assertEqual(streams.get_uniforms(25001).tolist(), list(streams.iter_uniforms(25001, chunk_size=1000)))
+        mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+        price = mc.run(OptionType.PUT, 25001, 0, native=False, seed=13)
+        self.assertEqual(price, mc.run(OptionType.PUT, 25001, 0, native=False, seed=13))
+        self.assertAlmostEqual(mc.simulate(OptionType.PUT, 25001, chunk_size=25001, seed=13).get_price(), price, 3)
+
+    def test_native_not_built(self):
+        '''simulate_native raises RuntimeError when the extension is not built, run falls back to python'''
+        native, monte_carlo._monte_carlo = monte_carlo._monte_carlo, None
+        try:
+            mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+            self.assertRaises(RuntimeError, mc.simulate_native, OptionType.PUT, 1000)
+            self.assertRaises(RuntimeError, mc.run, OptionType.PUT, 1000, native=True)
+            self.assertEqual(mc.run(OptionType.PUT, 1000, 0, native=False, seed=12), 
+                             mc.run(OptionType.PUT, 1000, 0, seed=12))
+        finally:
+            monte_carlo._monte_carlo = native
+
+    def test_simulate(self):
+        '''Run the same test with numpy'''
+        mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+        result = mc.simulate(OptionType.PUT, 1000000, seed=1)
+        self.assertEqual(1000000, result.num)
+        self.assertAlmostEqual(6.7601, result.get_price(), 1)
+        self.assertTrue(result.get_std_err() < 0.01)
+        low, high = result.get_conf_interval(4)
+        self.assertTrue(low < 6.7601 < high)
+
+    def test_simulate_chunks(self):
+        '''Each chunk has its own random stream, the last chunk may be short'''
+        mc = MonteCarlo(60, 65, 0.08, 0.25, 0.3)
+        result = mc.simulate(OptionType.CALL, 100001, seed=2)
+        result2 = mc.simulate(OptionType.CALL, 100001, chunk_size=999, seed=2)
+        self.assertEqual(100001, result2.num)
+        self.assertTrue(abs(result.get_price() - result2.get_price()) < 
+                        4 * sqrt(result.get_std_err()**2 + result2.get_std_err()**2))
+        self.assertAlmostEqual(2.1334, result.get_price(), 1)
+        self.assertEqual(result2.get_price(), mc.simulate(OptionType.CALL, 100001, chunk_size=999, seed=2).get_price())
+
+    def test_simulate_mp(self):
+        '''Split the paths across 4 processes, with reproducible and independent random streams'''
+        mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+        result = mc.simulate(OptionType.PUT, 1000001, seed=3, ps_num=4)
+        self.assertEqual(1000001, result.num)
+        low, high = result.get_conf_interval(4)
+        self.assertTrue(low < 6.7601 < high)
+
+        # The same seed gives the same price whatever the state of the parent process and ps_num are
+        np.random.seed(10)
+        self.assertEqual(result.get_price(), mc.simulate(OptionType.PUT, 1000001, seed=3, ps_num=4).get_price())
+        self.assertEqual(result.get_price(), mc.simulate(OptionType.PUT, 1000001, seed=3, ps_num=3).get_price())
+        self.assertEqual(result.get_price(), mc.simulate(OptionType.PUT, 1000001, seed=3).get_price())
+        self.assertNotEqual(result.get_price(), mc.simulate(OptionType.PUT, 1000001, seed=4, ps_num=4).get_price())
+
+    def test_shards(self):
+        '''Split a run across "hosts" by worker id and merge the shards'''
+        mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+        shards = [mc.simulate(OptionType.PUT, 200000, seed=5, run_id=1, worker_id=i) for i in range(3)]
+        result = merge_results(shards)
+        self.assertEqual(600000, result.num)
+        self.assertAlmostEqual(sum(r.get_price() for r in shards) / 3, result.get_price(), 10)
+        low, high = result.get_conf_interval(4)
+        self.assertTrue(low < 6.7601 < high)
+
+        # Reproducible shard by shard, and independent of each other and of other runs
+        self.assertEqual(shards[1].get_price(),
+                         mc.simulate(OptionType.PUT, 200000, seed=5, run_id=1, worker_id=1).get_price())
+        self.assertEqual(5, shards[2].seed)
+        prices = set(r.get_price() for r in shards)
+        prices.add(mc.simulate(OptionType.PUT, 200000, seed=5, run_id=2, worker_id=1).get_price())
+        self.assertEqual(4, len(prices))
+
+    def test_variance_reduction(self):
+        '''Antithetic variates and the control variate give the same price with smaller standard errors'''
+        mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+        plain = mc.simulate(OptionType.PUT, 200000, seed=6)
+        for antithetic, control_variate in ((True, False), (False, True), (True, True)):
+            result = mc.simulate(OptionType.PUT, 200000, seed=6, antithetic=antithetic, control_variate=control_variate)
+            self.assertTrue(result.get_std_err() < plain.get_std_err() * 0.8)
+            low, high = result.get_conf_interval(4)
+            self.assertTrue(low < 6.7601 < high)
+
+        # The control variate works for calls too, also across processes
+        mc = MonteCarlo(60, 65, 0.08, 0.25, 0.3)
+        result = mc.simulate(OptionType.CALL, 200000, seed=7, ps_num=2, control_variate=True)
+        self.assertTrue(result.get_std_err() < mc.simulate(OptionType.CALL, 200000, seed=7).get_std_err() * 0.8)
+        low, high = result.get_conf_interval(4)
+        self.assertTrue(low < 2.1334 < high)
+
+    def test_simulate_until(self):
+        '''Stop as soon as the standard error reaches the target, or the time budget is spent'''
+        mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+        result = mc.simulate_until(OptionType.PUT, target_std_err=0.01, seed=8, antithetic=True, control_variate=True)
+        self.assertTrue(result.get_std_err() <= 0.01)
+        self.assertTrue(result.num < mc.simulate_until(OptionType.PUT, target_std_err=0.01, seed=8).num)
+        low, high = result.get_conf_interval(4)
+        self.assertTrue(low < 6.7601 < high)
+
+        result = mc.simulate_until(OptionType.PUT, target_std_err=1e-6, time_budget=0.2, seed=8)
+        self.assertTrue(result.get_std_err() > 1e-6)
+        self.assertEqual(25000, mc.simulate_until(OptionType.PUT, target_std_err=1e-6, max_num=25000, seed=8).num)
+        self.assertRaises(ValueError, mc.simulate_until, OptionType.PUT)
+
+    def test_simulate_qmc(self):
+        '''Quasi-Monte Carlo is far more accurate than Monte Carlo with the same number of paths'''
+        mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+        bs_price = BlackScholes('stock_option', 50, 52, 0.05, 2, 0.3).get_option_price(OptionType.PUT, 10)
+        result = mc.simulate_qmc(OptionType.PUT, 2**18, seed=9)
+        self.assertEqual(16, result.num)
+        self.assertTrue(result.get_std_err() < mc.simulate(OptionType.PUT, 2**18, seed=9).get_std_err() / 10)
+        low, high = result.get_conf_interval(4)
+        self.assertTrue(low < bs_price < high)
+        self.assertAlmostEqual(bs_price, result.get_price(), 3)
+
+        # Chunks of a replication continue the same scrambled sequence
+        result2 = mc.simulate_qmc(OptionType.PUT, 2**18, chunk_size=5000, seed=9)
+        self.assertAlmostEqual(result.get_price(), result2.get_price(), 10)
+        result2 = mc.simulate_qmc(OptionType.PUT, 2**18, replications=8, seed=9, antithetic=True)
+        low, high = result2.get_conf_interval(4)
+        self.assertTrue(low < bs_price < high)
+
+        # The remainder of simu_num is not simulated, and every replication needs a point
+        self.assertEqual(result.get_price(), mc.simulate_qmc(OptionType.PUT, 2**18 + 15, seed=9).get_price())
+        self.assertRaises(AssertionError, mc.simulate_qmc, OptionType.PUT, 15, seed=9)
+
+    def test_simulate_ladder(self):
+        '''A ladder of strikes priced from the same paths'''
+        strikes = np.arange(30, 75, 2.5)
+        calls, puts = simulate_ladder(50, strikes, 0.05, 2, 0.3, 200000, seed=10)
+        self.assertEqual((len(strikes),), calls.get_price().shape)
+        self.assertEqual((len(strikes),), puts.get_std_err().shape)
+        bs_calls = get_option_prices(50, strikes, 0.05, 2, 0.3, 0.05, OptionType.CALL)
+        bs_puts = get_option_prices(50, strikes, 0.05, 2, 0.3, 0.05, OptionType.PUT)
+        self.assertTrue((np.abs(calls.get_price() - bs_calls) < 4 * calls.get_std_err()).all())
+        self.assertTrue((np.abs(puts.get_price() - bs_puts) < 4 * puts.get_std_err()).all())
+
+        # Same as the single strike engine with the same random streams
+        result = MonteCarlo(50, 52.5, 0.05, 2, 0.3).simulate(OptionType.PUT, 200000, chunk_size=10000, seed=10)
+        self.assertAlmostEqual(result.get_price(), puts.get_price()[9], 10)
+        self.assertAlmostEqual(result.get_std_err(), puts.get_std_err()[9], 10)
+
+        # No butterfly arbitrage and put-call parity holds path by path
+        self.assertTrue((np.diff(calls.get_price(), 2) > 0).all())
+        self.assertTrue((np.diff(puts.get_price(), 2) > 0).all())
+        forwards = calls.get_price() - puts.get_price() + strikes * np.exp(- 0.05 * 2)
+        self.assertTrue(np.ptp(forwards) < 1e-10)
+
+    def test_merge_ladder_shards(self):
+        '''Merging the shards of a ladder, whose sums are arrays, leaves the shards unchanged'''
+        strikes = np.array([45, 50, 55])
+        shards = [simulate_ladder(50, strikes, 0.05, 2, 0.3, 50000, seed=11, worker_id=i) for i in range(3)]
+        prices = [calls.get_price() for calls, puts in shards]
+        std_errs = [calls.get_std_err() for calls, puts in shards]
+        calls = merge_results([c for c, p in shards])
+        self.assertEqual(150000, calls.num)
+        self.assertTrue(np.allclose(sum(prices) / 3, calls.get_price(), atol=1e-10))
+        for (c, p), price, std_err in zip(shards, prices, std_errs):
+            self.assertEqual(50000, c.num)
+            self.assertTrue((price == c.get_price()).all() and (std_err == c.get_std_err()).all())
+
+        # Merging again gives the same result
+        self.assertTrue((calls.get_price() == merge_results([c for c, p in shards]).get_price()).all())
+        calls.merge(shards[1][0])
+        self.assertTrue((prices[0] == shards[0][0].get_price()).all())
+
+    def test_zero_coc(self):
+        '''An explicit cost of carry 0 (an option on a future) is kept, not replaced by the rate'''
+        self.assertEqual(0, MonteCarlo(50, 52, 0.05, 2, 0.3, 0).cost_of_carry)
+        self.assertEqual(0.05, MonteCarlo(50, 52, 0.05, 2, 0.3).cost_of_carry)
+        strikes = np.array([45, 50, 55])
+        calls, puts = simulate_ladder(50, strikes, 0.05, 2, 0.3, 100000, coc=0, seed=10)
+        bs_calls = get_option_prices(50, strikes, 0.05, 2, 0.3, 0, OptionType.CALL)
+        self.assertTrue((np.abs(calls.get_price() - bs_calls) < 4 * calls.get_std_err()).all())
 
     def tearDown(self):
         print '{} takes {} seconds'.format(self.__str__(), time.time() - self.t0)
 
+
+@skipIf(monte_carlo._monte_carlo is None, 'the native simulation is not built, run setup.py build_ext')
+class NativeMonteCarloTestCase(TestCase):
+
+    def test_simulate_native(self):
+        '''The same option as test_simulate: the price is within 3 standard errors of 6.7601'''
+        mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+        result = mc.simulate_native(OptionType.PUT, 1000000)
+        self.assertEqual(1000000, result.num)
+        self.assertTrue(abs(result.get_price() - 6.7601) < 3 * result.get_std_err())
+        self.assertTrue(result.get_std_err() < 0.01)
+        self.assertTrue(abs(mc.run(OptionType.PUT, 300000, native=True) - 6.7601) < 0.05)
+
+        # run uses it automatically, whatever ps_num is
+        price = round(mc.simulate_native(OptionType.PUT, 300000, seed=12).get_price(), 4)
+        self.assertEqual(price, mc.run(OptionType.PUT, 300000, seed=12))
+        self.assertEqual(price, mc.run(OptionType.PUT, 300000, 0, seed=12))
+
+    def test_threads(self):
+        '''The result only depends on the seed and the chunks, not on the number of threads'''
+        mc = MonteCarlo(60, 65, 0.08, 0.25, 0.3)
+        results = [mc.simulate_native(OptionType.CALL, 250001, 10000, seed=7, thread_num=n) for n in (1, 3, 0)]
+        for result in results[1:]:
+            self.assertEqual(results[0].sum_, result.sum_)
+            self.assertEqual(results[0].sum_sq, result.sum_sq)
+        self.assertNotEqual(results[0].sum_, mc.simulate_native(OptionType.CALL, 250001, 10000, seed=8).sum_)
+        self.assertNotEqual(results[0].sum_, mc.simulate_native(OptionType.CALL, 250001, 10000, seed=7, run_id=1).sum_)
+
+    def test_buffer(self):
+        '''The sums of each chunk are written to the buffer given, the price and standard error are returned'''
+        mc = MonteCarlo(50, 52, 0.05, 2, 0.3)
+        sums = np.empty((3, 2))
+        price, std_err = monte_carlo._monte_carlo.simulate(-1, 50, 52, 0.05, 2, 0.3, 0.05, 25000, 10000, 1, 0, 0, 2, sums)
+        result = mc.simulate_native(OptionType.PUT, 25000, 10000, seed=1)
+        self.assertAlmostEqual(result.get_price(), price, 12)
+        self.assertAlmostEqual(result.get_std_err(), std_err, 12)
+        self.assertAlmostEqual(result.sum_, sums[:, 0].sum(), 6)
+        self.assertTrue((sums > 0).all())
+        self.assertRaises(ValueError, monte_carlo._monte_carlo.simulate, 
+                          -1, 50, 52, 0.05, 2, 0.3, 0.05, 25000, 10000, 1, 0, 0, 2, np.empty((2, 2)))
+
+
 if __name__ == '__main__':
     main()
@@ -3,6 +3,8 @@
 
 import math
 
+import numpy as np
+
 class Option(object):
     def __init__(self, spot, strike, rate, expiry, vol):
         self.spot = spot
@@ -22,6 +24,31 @@ class OptionTypeError(Exception):
         return 'Unknown option type. It must be OptionType.CALL or OptionType.PUT'
 
 
+# Coefficients of the Hart algorithm, shared by cdf and cdf_array
+_CDF_A = (0.0352624965998911, 0.700383064443688,
+          6.37396220353165,   33.912866078383,
+          112.079291497871,   221.213596169931,
+          220.206867912376)
+_CDF_B = (0.0883883476483184, 1.75566716318264,
+          16.064177579207,    86.7807322029461,
+          296.564248779674,   637.333633378831,
+          793.826512519948,   440.413735824752)
+
+# Coefficients and break-points of the Acklam algorithm, shared by norminv and norminv_array
+_NORMINV_A = (-3.969683028665376e+01,  2.209460984245205e+02,
+              -2.759285104469687e+02,  1.383577518672690e+02,
+              -3.066479806614716e+01,  2.506628277459239e+00)
+_NORMINV_B = (-5.447609879822406e+01,  1.615858368580409e+02,
+              -1.556989798598866e+02,  6.680131188771972e+01,
+              -1.328068155288572e+01)
+_NORMINV_C = (-7.784894002430293e-03, -3.223964580411365e-01,
+              -2.400758277161838e+00, -2.549732539343734e+00,
+               4.374664141464968e+00,  2.938163982698783e+00)
+_NORMINV_D = ( 7.784695709041462e-03,  3.224671290700398e-01,
+               2.445134137142996e+00,  3.754408661907416e+00)
+_NORMINV_PLOW = 0.02425
+
+
 def cdf(x):
     '''Calculate approximation of Cumulative Distribution Function by using Hart Algorithms
             
@@ -65,15 +92,8 @@ def cdf(x):
     y = math.fabs(x);
     
     if y < 7.07106781186547:
-        a = (0.0352624965998911, 0.700383064443688,
-             6.37396220353165,   33.912866078383,
-             112.079291497871,   221.213596169931,
-             220.206867912376
-            )
-        b = (0.0883883476483184, 1.75566716318264,
-             16.064177579207,    86.7807322029461,
-             296.564248779674,   637.333633378831,
-             793.826512519948,   440.413735824752)
+        a = _CDF_A
+        b = _CDF_B
 
         aa = (((((a[0] * y + a[1]) * y + a[2]) * y + a[3]) * y + a[4]) * y + a[5]) * y + a[6]
         bb = ((((((b[0] * y + b[1]) * y + b[2]) * y + b[3]) * y + b[4]) * y + b[5]) * y + b[6]) * y + b[7]
@@ -117,20 +137,13 @@ def norminv(p):
         raise ValueError( "Argument %f must be in open interval (0,1)" % p )
 
     # Coefficients in rational approximations.
-    a = (-3.969683028665376e+01,  2.209460984245205e+02,
-         -2.759285104469687e+02,  1.383577518672690e+02,
-         -3.066479806614716e+01,  2.506628277459239e+00)
-    b = (-5.447609879822406e+01,  1.615858368580409e+02,
-         -1.556989798598866e+02,  6.680131188771972e+01,
-         -1.328068155288572e+01 )
-    c = (-7.784894002430293e-03, -3.223964580411365e-01,
-         -2.400758277161838e+00, -2.549732539343734e+00,
-          4.374664141464968e+00,  2.938163982698783e+00)
-    d = ( 7.784695709041462e-03,  3.224671290700398e-01,
-          2.445134137142996e+00,  3.754408661907416e+00)
+    a = _NORMINV_A
+    b = _NORMINV_B
+    c = _NORMINV_C
+    d = _NORMINV_D
 
     # Define break-points.
-    plow  = 0.02425
+    plow  = _NORMINV_PLOW
     phigh = 1 - plow
 
     
@@ -146,3 +159,134 @@ def norminv(p):
         ret = (((((a[0]*r+a[1])*r+a[2])*r+a[3])*r+a[4])*r+a[5])*q / (((((b[0]*r+b[1])*r+b[2])*r+b[3])*r+b[4])*r+1)
     
     return ret
+
+
+def _polyval(coeffs, x):
+    '''Evaluate a polynomial by Horner's rule in place, highest order coefficient first.
+    This keeps exactly the same operation order as the scalar code above.'''
+    ret = np.empty_like(x)
+    ret.fill(coeffs[0])
+    for coeff in coeffs[1:]:
+        ret *= x
+        ret += coeff
+
+    return ret
+
+
+def cdf_array(x):
+    '''Vectorized version of cdf: take an array of any shape and return N(x) of the same shape.
+
+    The regions are the same as in cdf. Each region is only evaluated on the elements
+    which fall into it, so no temporary array is built for a branch that is not taken.
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.abs(x)
+    n = np.zeros_like(y) # y > 37 or nan
+
+    idx = y < 7.07106781186547
+    if idx.any():
+        yy = y[idx]
+        aa = _polyval(_CDF_A, yy)
+        aa /= _polyval(_CDF_B, yy)
+        yy *= yy
+        yy *= -0.5
+        np.exp(yy, out=yy)
+        aa *= yy
+        n[idx] = aa
+
+    idx = (y >= 7.07106781186547) & (y <= 37)
+    if idx.any():
+        yy = y[idx]
+        c = yy + 1 / (yy + 2 / (yy + 3 / (yy + 4 / (yy + 0.65))))
+        c *= 2.506628274631
+        yy *= yy
+        yy *= -0.5
+        np.exp(yy, out=yy)
+        yy /= c
+        n[idx] = yy
+
+    idx = x > 0
+    n[idx] = 1 - n[idx]
+
+    return n
+
+
+def norminv_array(p):
+    '''Vectorized version of norminv: take an array of probabilities of any shape
+    and return the lower tail quantiles of the same shape.
+
+    The rational approximations and break-points are the same as in norminv.
+    Each region is only evaluated on the elements which fall into it.
+    '''
+    p = np.asarray(p, dtype=float)
+    if not ((p > 0) & (p < 1)).all():
+        raise ValueError('All arguments must be in open interval (0,1)')
+
+    ret = np.empty_like(p)
+    plow = _NORMINV_PLOW
+    phigh = 1 - plow
+
+    idx = p < plow # Rational approximation for lower region
+    if idx.any():
+        q = np.log(p[idx])
+        q *= -2
+        np.sqrt(q, out=q)
+        num = _polyval(_NORMINV_C, q)
+        num /= _polyval(_NORMINV_D + (1,), q)
+        ret[idx] = num
+
+    idx = p > phigh # Rational approximation for upper region
+    if idx.any():
+        q = np.log(1 - p[idx])
+        q *= -2
+        np.sqrt(q, out=q)
+        num = _polyval(_NORMINV_C, q)
+        num /= _polyval(_NORMINV_D + (1,), q)
+        np.negative(num, out=num)
+        ret[idx] = num
+
+    idx = (p >= plow) & (p <= phigh) # Rational approximation for central region
+    if idx.any():
+        q = p[idx] - 0.5
+        r = q * q
+        num = _polyval(_NORMINV_A, r)
+        num *= q
+        num /= _polyval(_NORMINV_B + (1,), r)
+        ret[idx] = num
+
+    return ret
+
+
+def _two_product(a, b):
+    '''Dekker's error-free product: return p, e such that p == fl(a * b) and p + e == a * b exactly'''
+    p = a * b
+    a_hi, a_lo = _split(a)
+    b_hi, b_lo = _split(b)
+    e = ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+
+    return p, e
+
+
+def _split(a):
+    c = 134217729.0 * a # 2**27 + 1
+    hi = c - (c - a)
+
+    return hi, a - hi
+
+
+def round_array(x, round_digit):
+    '''Round every element of an array to round_digit decimals, giving the same result as the builtin round.
+
+    The builtin round works on the exact decimal value of a float and rounds halves away from zero,
+    whereas numpy.round scales by 10**round_digit first (and so inherits the rounding error of
+    that product) and rounds halves to even. Here the rounding error of the product is recovered
+    exactly and used to decide the elements which look like a half.
+    '''
+    x = np.asarray(x, dtype=float)
+    scaled, err = _two_product(np.abs(x), 10.0 ** round_digit)
+    ret = np.floor(scaled)
+    frac = scaled - ret
+    ret += (frac > 0.5) | ((frac == 0.5) & (err >= 0))
+    ret /= 10.0 ** round_digit
+
+    return np.copysign(ret, x)
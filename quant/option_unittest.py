@@ -0,0 +1,60 @@
+from unittest import TestCase, main
+
+import numpy as np
+
+from option import cdf, cdf_array, norminv, norminv_array, round_array
+
+
+class CdfArrayTestCase(TestCase):
+
+    def test_same_as_scalar(self):
+        '''All three regions of the Hart algorithm, including the break-points'''
+        xs = np.concatenate((np.linspace(-40, 40, 4001),
+                             [-37, 37, -7.07106781186547, 7.07106781186547, 0]))
+        expected = [cdf(x) for x in xs]
+        np.testing.assert_allclose(cdf_array(xs), expected, rtol=1e-14, atol=0)
+
+    def test_shape(self):
+        xs = np.linspace(-3, 3, 12).reshape(3, 4)
+        result = cdf_array(xs)
+        self.assertEqual((3, 4), result.shape)
+        self.assertAlmostEqual(cdf(xs[2, 1]), result[2, 1], 14)
+        self.assertAlmostEqual(cdf(0.3), float(cdf_array(0.3)), 14)
+
+
+class NorminvArrayTestCase(TestCase):
+
+    def test_same_as_scalar(self):
+        '''Lower, central and upper regions of the Acklam algorithm, including the break-points'''
+        ps = np.concatenate((np.linspace(1e-10, 1 - 1e-10, 4001),
+                             [0.02425, 1 - 0.02425, 1e-300, 0.5]))
+        expected = [norminv(p) for p in ps]
+        np.testing.assert_allclose(norminv_array(ps), expected, rtol=1e-14, atol=1e-300)
+
+    def test_shape(self):
+        ps = np.linspace(0.01, 0.99, 12).reshape(2, 2, 3)
+        result = norminv_array(ps)
+        self.assertEqual((2, 2, 3), result.shape)
+        self.assertAlmostEqual(norminv(ps[1, 0, 2]), result[1, 0, 2], 14)
+
+    def test_out_of_range(self):
+        self.assertRaises(ValueError, norminv_array, [0.5, 0])
+        self.assertRaises(ValueError, norminv_array, [1.0, 0.5])
+
+
+class RoundArrayTestCase(TestCase):
+
+    def test_same_as_round(self):
+        xs = [2.13345, -2.13345, 0.00005, -0.00005, 6.760149, 1.5, -2.5, 0]
+        self.assertEqual([round(x, 4) for x in xs], list(round_array(xs, 4)))
+        self.assertEqual([round(x) for x in xs], list(round_array(xs, 0)))
+
+        xs = np.random.RandomState(1).uniform(-100, 100, 10000)
+        for digit in (0, 2, 4, 8):
+            self.assertEqual([round(x, digit) for x in xs], list(round_array(xs, digit)))
+        xs = np.arange(-2000, 2000) / 8.0 # exact halves
+        self.assertEqual([round(x, 2) for x in xs], list(round_array(xs, 2)))
+
+
+if __name__ == '__main__':
+    main()
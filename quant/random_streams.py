@@ -0,0 +1,111 @@
+'''
+Reproducible and splittable random streams for the Monte Carlo engines.
+
+Every stream is addressed by a key:
+
+    (seed, run_id, worker_id, chunk_id)
+
+    where
+        seed:      chosen by the caller, or drawn from the operating system once and reported back
+        run_id:    tells apart the runs which share a seed, e.g. the repricing of the same book at each tick
+        worker_id: a process or a host which a run is split across
+        chunk_id:  a chunk of paths simulated by a worker
+
+The whole key is used to initialize a Mersenne Twister (numpy.random.RandomState takes an array as seed
+and hashes all of it into the 19937 bits state), so streams with different keys are independent and the
+numbers of a chunk don't depend on which process, host or order the chunk is simulated in.
+A simulation split into chunks can then be reproduced bit for bit, and more workers can be added to a run
+without reusing any stream, which would bias the estimate.
+
+Quasi-random numbers:
+
+    The Halton sequence fills the unit cube far more evenly than random numbers. Its point i in dimension d is 
+    the radical inverse of i in the d-th prime base b:
+
+        i = sum(a_k * b**k)  =>  x_i = sum(a_k * b**(-k-1))
+
+    To get a valid error estimate, the sequence is randomized by scrambling: the digit a_k is replaced by 
+    perm_k(a_k), where perm_k is a random permutation of 0, ..., b-1 for every digit position k and dimension.
+    Each scrambled point is uniformly distributed, and scramblings with independent permutations 
+    (randomized QMC replications) give independent estimates.
+'''
+
+from math import ceil, log
+
+import numpy as np
+
+
+def get_new_seed():
+    '''Draw a seed from the operating system, without touching the global random state'''
+    return int(np.random.RandomState().randint(2**31))
+
+
+class RandomStreams(object):
+    def __init__(self, seed=None, run_id=0):
+        self.seed = get_new_seed() if seed is None else seed
+        self.run_id = run_id
+
+    def get_random_state(self, worker_id=0, chunk_id=0):
+        '''Return the numpy.random.RandomState of the stream (seed, run_id, worker_id, chunk_id)'''
+        return np.random.RandomState([self.seed, self.run_id, worker_id, chunk_id])
+
+    def get_uniforms(self, num, worker_id=0, chunk_id=0):
+        '''Return num uniform random numbers in the open interval (0, 1) from the stream
+        (seed, run_id, worker_id, chunk_id), ready to be mapped by norminv'''
+        return get_open_uniforms(self.get_random_state(worker_id, chunk_id), num)
+
+    def iter_uniforms(self, num, worker_id=0, chunk_id=0, chunk_size=10000):
+        '''Yield the same numbers as get_uniforms one by one, drawn chunk_size at a time, 
+        so the memory used is O(chunk_size) whatever num is'''
+        rs = self.get_random_state(worker_id, chunk_id)
+        for start in xrange(0, num, chunk_size):
+            for u in get_open_uniforms(rs, min(chunk_size, num - start)).tolist():
+                yield u
+
+
+def get_open_uniforms(rs, num):
+    '''Return the next num uniform random numbers of the numpy.random.RandomState rs, 
+    in the open interval (0, 1)'''
+    u = rs.random_sample(num)
+    return np.maximum(u, 2.0 ** -54, out=u) # random_sample is in [0, 1)
+
+
+def get_primes(num):
+    '''Return the first num prime numbers'''
+    primes = []
+    n = 2
+    while len(primes) < num:
+        if all(n % p for p in primes if p * p <= n):
+            primes.append(n)
+        n += 1
+
+    return primes
+
+
+def get_scrambled_halton(num, dims, rs, start=0):
+    '''Return the points start, ..., start + num - 1 of a Halton sequence in dims dimensions, 
+    as a (num, dims) array in the open interval (0, 1), scrambled by random digit permutations 
+    drawn from the numpy.random.RandomState rs.
+
+    The permutations only depend on rs, so a sequence can be generated chunk by chunk: 
+    pass a RandomState in the same state for every chunk.
+    '''
+    idx = np.arange(start, start + num)
+    points = np.empty((num, dims))
+    for d, base in enumerate(get_primes(dims)):
+        # Enough digits for any index below 2**32; the permuted leading zeros act as a random shift
+        digit_num = int(ceil(32 * log(2) / log(base)))
+        perms = [rs.permutation(base) for k in xrange(digit_num)]
+        point = np.zeros(num)
+        rest = idx.copy()
+        scale = 1.0
+        for perm in perms:
+            scale /= base
+            if rest.any():
+                point += perm[rest % base] * scale
+                rest //= base
+            else: # a leading zero for every point
+                point += perm[0] * scale
+        points[:, d] = point
+
+    return np.maximum(points, 2.0 ** -54, out=points)
@@ -0,0 +1,18 @@
+'''
+Build the native extensions in place:
+
+    python setup.py build_ext --inplace
+
+The pure Python implementations are used when they are not built.
+'''
+
+from distutils.core import setup, Extension
+
+
+setup(name='hello-quant',
+      packages=['quant'],
+      ext_modules=[Extension('quant._binomial_trees', ['quant/binomial_trees.cpp'], extra_compile_args=['-O3']),
+                   Extension('quant._monte_carlo', ['quant/monte_carlo.cpp'],
+                             extra_compile_args=['-O3', '-std=c++11', '-pthread'], extra_link_args=['-pthread']),
+                   ],
+      )